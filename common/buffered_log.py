@@ -0,0 +1,116 @@
+'''
+# Date: 2026-10-18
+# Lab: LERIS/UFSCar
+# Project: CGReplay
+# Module: Common (CG Server + Player) / Buffered CSV Logs
+# One file descriptor per log, rows stored in preallocated columnar buffers and written by a
+# background thread when a buffer fills up or every flush_interval seconds (no open()/write() per row).
+# The same rows can also go to a typed columnar store (common/metrics_store.py).
+'''
+
+import atexit, os, threading
+
+from common.metrics_store import ChunkWriter
+
+LOG_FORMATS = ("csv", "npz")
+
+
+class BufferedLog:
+    """CSV log with a fixed schema: [(column, numpy dtype)] (see common.metrics_store.SCHEMAS).
+
+    log(*values) stores one row in the active buffer (one preallocated list per column); a full
+    buffer is handed to the flusher thread and replaced by a spare one, so the caller never waits
+    for the disk. The flusher also writes the partial buffer every flush_interval seconds, and
+    close() (registered with atexit) writes whatever is left. Values are written with str(), like
+    the f-strings they replace.
+
+    formats: "csv" (the text log at `path`) and/or "npz" (typed chunks of chunk_rows rows in
+    <path without .csv>.cols/, converted by the flusher thread, never by the caller; the last, partial
+    chunk is written by close(), so the CSV is the crash-safe copy of a killed run).
+    """
+
+    def __init__(self, path, schema, capacity=1024, flush_interval=1.0, formats=("csv",), chunk_rows=65536):
+        unknown = set(formats) - set(LOG_FORMATS)
+        if unknown:
+            raise ValueError(f"Unknown log formats {sorted(unknown)} (expected {LOG_FORMATS})")
+        self.path = path
+        self.columns = tuple(name for name, _ in schema)
+        self.capacity = capacity
+        self.flush_interval = flush_interval
+        self.file = None
+        if "csv" in formats:
+            self.file = open(path, "w")     # truncates the previous run's log
+            self.file.write(",".join(self.columns) + "\n")
+        self.store = ChunkWriter(path, schema, chunk_rows) if "npz" in formats else None
+
+        self.buffers = self._new_buffers()
+        self.size = 0                   # rows in the active buffers
+        self.pending = []               # (buffers, size) waiting for the flusher
+        self.spare = []                 # written buffers, reused by _swap()
+        self.rows = 0                   # rows logged
+        self.lock = threading.Lock()            # active/pending buffers
+        self.write_lock = threading.Lock()      # file writes (flusher thread vs close())
+        self.wakeup = threading.Event()
+        self.closed = False
+        self.finished = False           # files closed
+        self.thread = threading.Thread(target=self._run, name=f"log-flusher-{os.path.basename(path)}", daemon=True)
+        self.thread.start()
+        atexit.register(self.close)
+
+    def _new_buffers(self):
+        return [[None] * self.capacity for _ in self.columns]
+
+    def _swap(self):
+        self.pending.append((self.buffers, self.size))
+        self.buffers = self.spare.pop() if self.spare else self._new_buffers()
+        self.size = 0
+
+    def log(self, *values):
+        with self.lock:
+            size = self.size
+            for buffer, value in zip(self.buffers, values):
+                buffer[size] = value
+            self.size = size + 1
+            self.rows += 1
+            if self.size == self.capacity:
+                self._swap()
+                self.wakeup.set()
+
+    def _run(self):
+        while not self.closed:
+            self.wakeup.wait(self.flush_interval)
+            self.wakeup.clear()
+            self.flush()
+
+    def flush(self):
+        """Writes every buffered row to the file."""
+        with self.write_lock:
+            with self.lock:
+                if self.size:
+                    self._swap()
+                batches, self.pending = self.pending, []
+            if not batches or self.finished:
+                return
+            for buffers, size in batches:
+                if self.file:
+                    self.file.write("".join(",".join(map(str, row)) + "\n"
+                                            for row in zip(*(buffer[:size] for buffer in buffers))))
+                if self.store:
+                    self.store.append(buffers, size)
+                with self.lock:
+                    self.spare.append(buffers)
+            if self.file:
+                self.file.flush()
+
+    def close(self):
+        if self.closed:
+            return
+        self.closed = True
+        self.wakeup.set()
+        self.thread.join(timeout=1)
+        self.flush()
+        self.finished = True
+        if self.file:
+            self.file.close()
+        if self.store:
+            self.store.close()
@@ -0,0 +1,119 @@
+'''
+# Date: 2026-10-18
+# Lab: LERIS/UFSCar
+# Project: CGReplay
+# Module: Common (CG Server + Player) / Clock Sync
+# NTP-style estimation of the offset between the player's and the server's time.perf_counter() over
+# the server's control port, so the timestamps of both hosts can be put on one time line:
+#   player t1 -> SYNC_REQUEST -> server t2 (received), t3 (replied) -> SYNC_REPLY -> player t4
+#   rtt = (t4 - t1) - (t3 - t2)        offset = ((t2 - t1) + (t3 - t4)) / 2   (server = player + offset)
+# The estimate is the offset of the lowest-RTT sample of the last `window` ones (least queueing, so
+# the least asymmetric); its error is bounded by rtt / 2.
+'''
+
+import select, socket, threading, time
+from collections import deque
+
+from common.wire import MessageType, decode_sync_message, encode_sync_message, is_sync_message
+
+
+def clock_sample(t1, t2, t3, t4):
+    """(offset, rtt) in seconds of one request/reply exchange."""
+    return ((t2 - t1) + (t3 - t4)) / 2, (t4 - t1) - (t3 - t2)
+
+
+def answer_sync_request(sock, data, received_time, addr):
+    """Server side: replies to a SYNC_REQUEST with its arrival time (t2) and the reply time (t3)."""
+    request = decode_sync_message(data)
+    reply = encode_sync_message(MessageType.SYNC_REPLY, request.seq, request.t1, received_time,
+                                time.perf_counter(), request.session_id)
+    try:
+        sock.sendto(reply, addr)
+    except (BlockingIOError, InterruptedError):  # full send buffer: the player counts it as lost
+        return False
+    return True
+
+
+class ClockSync:
+    """Player side: background thread measuring the offset of the server clock.
+
+    Every `interval` seconds, `burst` requests are sent one after the other from a socket bound to
+    local_addr (each waits up to `timeout` for its reply; late or foreign replies are discarded).
+    on_sample(seq, t1, t2, t3, t4, offset, rtt) is called from the thread for each sample (e.g. to log it).
+    to_server(t) maps a player perf_counter() time to the server's once the first sample arrived.
+    """
+
+    def __init__(self, local_addr, server_addr, interval=1.0, burst=4, window=8, timeout=0.2,
+                 session_id=0, on_sample=None):
+        self.server_addr = server_addr
+        self.interval = interval
+        self.burst = burst
+        self.timeout = timeout
+        self.session_id = session_id
+        self.on_sample = on_sample
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.bind(local_addr)
+        self.samples = deque(maxlen=window)   # (offset, rtt)
+        self.offset = self.rtt = None         # current estimate (seconds)
+        self.seq = self.lost = 0
+        self.synced = threading.Event()
+        self.running = False
+        self.thread = None
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self._run, name="clock-sync", daemon=True)
+        self.thread.start()
+        return self
+
+    def wait(self, timeout=None):
+        """Waits for the first sample; returns True once synced."""
+        return self.synced.wait(timeout)
+
+    def stop(self):
+        self.running = False
+        if self.thread:
+            self.thread.join(timeout=self.interval + self.burst * self.timeout)
+        self.sock.close()
+
+    def _run(self):
+        while self.running:
+            for _ in range(self.burst):
+                self._exchange()
+            time.sleep(self.interval)
+
+    def _exchange(self):
+        self.seq = (self.seq + 1) & 0xFFFFFFFF
+        t1 = time.perf_counter()
+        self.sock.sendto(encode_sync_message(MessageType.SYNC_REQUEST, self.seq, t1, session_id=self.session_id),
+                         self.server_addr)
+        deadline = t1 + self.timeout
+        while True:
+            remaining = deadline - time.perf_counter()
+            if remaining <= 0 or not select.select([self.sock], [], [], remaining)[0]:
+                self.lost += 1
+                return
+            data = self.sock.recv(64)
+            t4 = time.perf_counter()
+            if not is_sync_message(data, MessageType.SYNC_REPLY):
+                continue
+            reply = decode_sync_message(data)
+            if reply.seq == self.seq:
+                break
+        offset, rtt = clock_sample(t1, reply.t2, reply.t3, t4)
+        self.samples.append((offset, rtt))
+        self.offset, self.rtt = min(self.samples, key=lambda sample: sample[1])
+        self.synced.set()
+        if self.on_sample:
+            self.on_sample(reply.seq, t1, reply.t2, reply.t3, t4, offset, rtt)
+
+    def to_server(self, t):
+        """Player time -> server time (unchanged while not synced)."""
+        offset = self.offset
+        return t if offset is None else t + offset
+
+    def stats(self):
+        """(samples, lost, offset ms, rtt ms) of the current estimate."""
+        if self.offset is None:
+            return self.seq - self.lost, self.lost, 0.0, 0.0
+        return self.seq - self.lost, self.lost, self.offset * 1000, self.rtt * 1000
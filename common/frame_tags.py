@@ -0,0 +1,178 @@
+'''
+# Date: 2026-10-18
+# Lab: LERIS/UFSCar
+# Project: CGReplay
+# Module: Common (CG Server + Player) / Frame Tags
+# Pluggable "frame tag" backends: how the CG Server burns the frame ID into the pixels of a frame
+# (render) and how the player reads it back (read). Both ends place the tag with placement().
+#
+#   qr    : QR code (qrcode / pyzbar), the original CGReplay transport; can carry free text.
+#   strip : block pattern of BLOCK x BLOCK cells aligned on the 16x16 macroblock grid, decoded
+#           with a few numpy reductions (no image decoder).
+#
+# Strip layout (ROWS x COLS = 6 x 8 cells, row-major, 1 = white):
+#   cells 0, 7, 40, 47 (the 4 corners) are references: top-left/bottom-right white, top-right/bottom-left black
+#   the other 44 cells carry, MSB first: frame_id (32 bits) | CRC-8 of the 4 frame_id bytes (8 bits) |
+#   4 parity bits (even parity of each frame_id byte)
+# Error detection: a frame is accepted only if both the CRC-8 (poly 0x07, init 0x00, big-endian
+# frame_id bytes) and the 4 byte parities match; the references must also differ by at least
+# MIN_CONTRAST grey levels, otherwise the tag is reported as missing.
+'''
+
+import numpy as np
+
+from common.log import get_logger
+
+log = get_logger("frame_tags")
+
+FRAME_TAG_NAMES = ("qr", "strip")
+
+
+def placement(width, height, tile_width, tile_height, padding, align=1):
+    """Top-left corner (x, y) of a tag `padding` pixels from the bottom-right corner, aligned down to `align`."""
+    x = (width - tile_width - padding) // align * align
+    y = (height - tile_height - padding) // align * align
+    return x, y
+
+
+def parse_frame_id(tag_data):
+    """Frame ID of a tag text ("Frame ID: 12, ..."); -1 if it has none."""
+    for part in tag_data.split(','):
+        if "ID:" in part:
+            frame_id = part.split(':')[1].strip()
+            if frame_id:
+                return int(frame_id)
+    return -1
+
+
+def generate_qr_code(data, qr_size):
+    """Generate QR code as an image from the given data, resized to qr_size x qr_size."""
+    import cv2, qrcode
+
+    qr = qrcode.QRCode(
+        version=1,
+        error_correction=qrcode.constants.ERROR_CORRECT_L,
+        box_size= 20, #10,
+        border=4,
+    )
+    qr.add_data(data)
+    qr.make(fit=True)
+
+    # Create an image from the QR Code instance
+    qr_img = qr.make_image(fill='black', back_color='white')
+
+    # Convert to numpy array for OpenCV compatibility
+    qr_img = np.array(qr_img.convert('RGB'))
+
+    return cv2.resize(qr_img, (qr_size, qr_size))
+
+
+# Function to read the QR code from the frame
+def read_qr_code_from_frame(frame):
+    """Reads the QR code from a given frame (or region of it) and extracts its data; (-1, None) on a miss."""
+    import cv2
+    from pyzbar import pyzbar
+
+    gray_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
+    blurred_frame = cv2.GaussianBlur(gray_frame, (5, 5), 0)
+    qr_codes = pyzbar.decode(blurred_frame)
+
+    for qr in qr_codes:
+        qr_data = qr.data.decode('utf-8')
+        log.debug("Detected QR Code Data: %s", qr_data)
+        frame_id = parse_frame_id(qr_data)
+        if frame_id != -1:
+            return frame_id, qr_data
+
+    return -1, None
+
+
+class QRTag:
+    """QR code tag (qr_size x qr_size); the QR text is free (full or compact payload)."""
+
+    name = "qr"
+    carries_text = True
+    search_margin = True    # the QR detector finds the code anywhere in the scanned region
+    align = 1
+
+    def __init__(self, qr_size=200):
+        self.width = self.height = qr_size
+
+    def render(self, frame_id, text):
+        return generate_qr_code(text, self.width)
+
+    def read(self, region):
+        return read_qr_code_from_frame(region)
+
+
+def crc8(data, poly=0x07):
+    crc = 0
+    for byte in data:
+        crc ^= byte
+        for _ in range(8):
+            crc = ((crc << 1) ^ poly) & 0xFF if crc & 0x80 else (crc << 1) & 0xFF
+    return crc
+
+
+class StripTag:
+    """Block-pattern tag: 6 x 8 cells of `block` pixels carrying frame_id + CRC-8 + byte parities."""
+
+    name = "strip"
+    carries_text = False
+    search_margin = False   # read() expects the exact tag region (placement() is deterministic)
+    ROWS, COLS = 6, 8
+    REFERENCES = {0: 255, 7: 0, 40: 0, 47: 255}   # corner cell -> grey level
+    MIN_CONTRAST = 64
+
+    def __init__(self, block=16):
+        self.block = block
+        self.align = block      # cells on the macroblock grid survive H.264 quantization best
+        self.width = self.COLS * block
+        self.height = self.ROWS * block
+        self.data_cells = [c for c in range(self.ROWS * self.COLS) if c not in self.REFERENCES]
+        # Centre of each cell (the edges of a block smear first under compression)
+        self.inner = slice(block // 4, block - block // 4)
+
+    def bits(self, frame_id):
+        id_bytes = int(frame_id).to_bytes(4, "big")
+        bits = [(frame_id >> (31 - i)) & 1 for i in range(32)]
+        bits += [(crc8(id_bytes) >> (7 - i)) & 1 for i in range(8)]
+        bits += [bin(b).count("1") & 1 for b in id_bytes]
+        return bits
+
+    def render(self, frame_id, text=None):
+        cells = np.zeros(self.ROWS * self.COLS, dtype=np.uint8)
+        for cell, level in self.REFERENCES.items():
+            cells[cell] = level
+        cells[self.data_cells] = np.array(self.bits(frame_id), dtype=np.uint8) * 255
+        tile = np.kron(cells.reshape(self.ROWS, self.COLS), np.ones((self.block, self.block), dtype=np.uint8))
+        return np.repeat(tile[:, :, None], 3, axis=2)
+
+    def read(self, region):
+        """Decodes the tag from its exact region (BGR); (-1, None) when missing or corrupted."""
+        if region.shape[0] < self.height or region.shape[1] < self.width:
+            return -1, None
+        # Mean grey level of the centre of each cell: (rows, block, cols, block) -> (rows, cols)
+        gray = region[:self.height, :self.width].mean(axis=2) if region.ndim == 3 else region[:self.height, :self.width]
+        cells = gray.reshape(self.ROWS, self.block, self.COLS, self.block)[:, self.inner, :, self.inner].mean(axis=(1, 3)).ravel()
+
+        white = (cells[0] + cells[47]) / 2
+        black = (cells[7] + cells[40]) / 2
+        if white - black < self.MIN_CONTRAST:
+            return -1, None
+        bits = (cells[self.data_cells] > (white + black) / 2).astype(np.uint8)
+
+        frame_id = int(np.dot(bits[:32], 1 << np.arange(31, -1, -1, dtype=np.uint64)))
+        crc = int(np.dot(bits[32:40], 1 << np.arange(7, -1, -1)))
+        if crc != crc8(frame_id.to_bytes(4, "big")) or list(bits[40:44]) != self.bits(frame_id)[40:44]:
+            return -1, None
+        return frame_id, f"Frame ID: {frame_id}"
+
+
+def make_frame_tag(name, qr_size=200, block=16):
+    """Frame tag backend by name (config: overlay.tag)."""
+    if name == "qr":
+        return QRTag(qr_size)
+    if name == "strip":
+        return StripTag(block)
+    raise ValueError(f"Unknown frame tag '{name}' (expected one of {FRAME_TAG_NAMES})")
@@ -0,0 +1,72 @@
+'''
+# Date: 2026-10-18
+# Lab: LERIS/UFSCar
+# Project: CGReplay
+# Module: Common (CG Server + Player) / Console Logging
+# Leveled console logging (stdlib logging) instead of per-frame print(): the per-frame and
+# per-message lines are DEBUG, formatted lazily (%-style arguments, nothing is formatted when the
+# level is off), and a PeriodicSummary prints one INFO line per interval (FPS, gap, bitrate, ...).
+'''
+
+import logging, math, sys, time
+
+LOG_FORMAT = "%(asctime)s.%(msecs)03d %(levelname)-5s %(name)s | %(message)s"
+LOG_LEVELS = ("DEBUG", "INFO", "WARNING", "ERROR")
+
+
+def setup_logging(level="INFO"):
+    """Configures the console handler once (config: logging.level)."""
+    if level.upper() not in LOG_LEVELS:
+        raise ValueError(f"Unknown log level '{level}' (expected one of {LOG_LEVELS})")
+    logging.basicConfig(level=getattr(logging, level.upper()), format=LOG_FORMAT, datefmt="%H:%M:%S", stream=sys.stdout)
+
+
+def get_logger(name):
+    return logging.getLogger(f"cgreplay.{name}")
+
+
+class PeriodicSummary:
+    """Aggregates per-frame values and logs one INFO summary line every `interval` seconds.
+
+    tick(*values) takes one value per field (None = not available for this frame) and only
+    accumulates; the line reports the frame rate of the ticks plus the mean/min/max of each field
+    over the interval. interval <= 0 disables the summary.
+    """
+
+    def __init__(self, logger, fields, interval=1.0):
+        self.logger = logger
+        self.fields = tuple(fields)
+        self.interval = interval
+        self.start = time.perf_counter()
+        self._reset()
+
+    def _reset(self):
+        self.count = 0
+        self.n = [0] * len(self.fields)
+        self.sum = [0.0] * len(self.fields)
+        self.min = [math.inf] * len(self.fields)
+        self.max = [-math.inf] * len(self.fields)
+
+    def tick(self, *values):
+        if self.interval <= 0:
+            return
+        self.count += 1
+        for i, value in enumerate(values):
+            if value is None:
+                continue
+            self.n[i] += 1
+            self.sum[i] += value
+            if value < self.min[i]:
+                self.min[i] = value
+            if value > self.max[i]:
+                self.max[i] = value
+        now = time.perf_counter()
+        if now - self.start >= self.interval:
+            if self.logger.isEnabledFor(logging.INFO):
+                parts = [f"{self.count} frames ({self.count / (now - self.start):.1f}/s)"]
+                for i, field in enumerate(self.fields):
+                    if self.n[i]:
+                        parts.append(f"{field} mean={self.sum[i] / self.n[i]:.2f} min={self.min[i]:.2f} max={self.max[i]:.2f}")
+                self.logger.info(" | ".join(parts))
+            self.start = now
+            self._reset()
@@ -0,0 +1,148 @@
+'''
+# Date: 2026-10-18
+# Lab: LERIS/UFSCar
+# Project: CGReplay
+# Module: Common (CG Server + Player) / Columnar Metrics Store
+# Typed, fixed-schema columnar copy of the CSV logs: each log gets a directory <log>.cols/ holding
+# schema.json and compressed numpy chunks (chunk_000000.npz, ...), one array per column. The loader
+# concatenates the chunks (or falls back to the CSV), so post-processing skips text parsing.
+'''
+
+import glob, json, os
+import numpy as np
+
+STORE_VERSION = 1
+STORE_SUFFIX = ".cols"
+
+# Fixed schema of each log: (column, numpy dtype). The column names are the CSV headers.
+SCHEMAS = {
+    "server_rate_control": [("frame_id", "i8"), ("action", "U32"), ("factor", "f8"), ("gap", "f8"),
+                            ("bitrate", "f8"), ("trigger", "U8")],
+    "server_qoe": [("frame_id", "i8"), ("received_fame_id", "i8"), ("my_gap", "i8"), ("received_time", "f8"),
+                   ("send_time", "f8"), ("current_srv_fps", "f8"), ("received_fps", "f8"), ("current_cps", "f8"),
+                   ("received_cps", "f8"), ("current_srv_fps/received_fps", "f8"), ("received_cps/current_cps", "f8"),
+                   ("bitrate", "f8")],
+    "server_frame": [("frame_id", "i8"), ("resolution", "U16"), ("Frame Size(Byte)", "i8"), ("GOP", "i8"),
+                     ("current_srv_fps", "f8"), ("processing_time", "f8"), ("bitrate", "f8")],
+    "server_overlay": [("frame_id", "i8"), ("rcv_timestamp", "f8"), ("bitrate", "f8")],
+    "server_pacing": [("frame_id", "i8"), ("slot", "i8"), ("pts", "u8"), ("lateness_ms", "f8"),
+                      ("waited_ms", "f8"), ("dropped", "i8")],
+    "server_encode": [("frame_id", "i8"), ("pts", "u8"), ("profile", "U32"), ("frame_type", "U4"), ("encoded_bytes", "i8"),
+                      ("rtp_packets", "i8"), ("rtp_bytes", "i8"), ("convert_ms", "f8"), ("encode_ms", "f8"),
+                      ("packetize_ms", "f8")],
+    "server_stages": [("frame_id", "i8"), ("pts", "u8"), ("captured", "f8"), ("pushed", "f8"), ("encode_start", "f8"),
+                      ("encode_end", "f8"), ("sent", "f8")],
+    "server_bitrate": [("frame_id", "i8"), ("target_kbps", "f8"), ("applied_kbps", "f8"), ("encoded_kbps", "f8"),
+                       ("updates", "i8")],
+    "player_rate": [("frame_id", "i8"), ("fps", "f8"), ("cps", "f8")],
+    "player_time": [("frame_id", "i8"), ("frame_timestamp", "f8"), ("cmd_timestamp", "f8")],
+    "player_frame": [("frame_id", "i8"), ("frame_counter", "i8"), ("fps", "f8"), ("retry_status", "i1")],
+    "player_stages": [("frame_id", "i8"), ("clock_offset", "f8"), ("clock_rtt", "f8"), ("depayloaded", "f8"),
+                      ("decoded", "f8"), ("detected", "f8"), ("responded", "f8")],
+    "player_clock_sync": [("seq", "i8"), ("t1", "f8"), ("t2", "f8"), ("t3", "f8"), ("t4", "f8"), ("offset_ms", "f8"),
+                          ("rtt_ms", "f8")],
+}
+
+# Value stored for a missing (None) entry, by dtype kind
+MISSING = {"f": np.nan, "i": -1, "u": 0, "U": ""}
+
+
+def store_path(log_path):
+    """<log>.cols directory of a CSV log path (or of the store directory itself)."""
+    if log_path.endswith(STORE_SUFFIX):
+        return log_path
+    return os.path.splitext(log_path)[0] + STORE_SUFFIX
+
+
+def to_column(values, dtype):
+    """Python values -> 1-D typed array (None -> MISSING; numeric text such as a text-wire send_time is parsed).
+
+    Text columns store str(value), as in the CSV (e.g. a resolution tuple -> "(1200, 720)"); a value
+    that is not a number in a numeric column is stored as MISSING.
+    """
+    dtype = np.dtype(dtype)
+    missing = MISSING[dtype.kind]
+    if dtype.kind == "U":
+        return np.array([missing if v is None else str(v) for v in values], dtype=dtype)
+    try:
+        column = np.array([missing if v is None else v for v in values], dtype=dtype)
+        if column.shape == (len(values),):  # a sequence value would add a dimension
+            return column
+    except (TypeError, ValueError):
+        pass
+    column = np.empty(len(values), dtype=dtype)
+    for i, v in enumerate(values):
+        try:
+            column[i] = missing if v is None else float(v)
+        except (TypeError, ValueError):
+            column[i] = missing
+    return column
+
+
+class ChunkWriter:
+    """Appends rows (as column lists) to a <log>.cols store and writes a compressed chunk every chunk_rows rows
+    (and the remaining rows on close())."""
+
+    def __init__(self, log_path, schema, chunk_rows=65536):
+        self.directory = store_path(log_path)
+        self.schema = [(name, np.dtype(dtype)) for name, dtype in schema]
+        self.chunk_rows = chunk_rows
+        os.makedirs(self.directory, exist_ok=True)
+        for old_chunk in glob.glob(os.path.join(self.directory, "chunk_*.npz")):  # previous run
+            os.remove(old_chunk)
+        with open(os.path.join(self.directory, "schema.json"), "w") as f:
+            json.dump({"version": STORE_VERSION, "columns": [[name, dtype.str] for name, dtype in self.schema]}, f)
+        self.batches = []               # typed column tuples waiting for the next chunk
+        self.rows = 0                   # rows in self.batches
+        self.chunks = 0
+
+    def append(self, columns, size):
+        self.batches.append([to_column(column[:size], dtype) for column, (_, dtype) in zip(columns, self.schema)])
+        self.rows += size
+        if self.rows >= self.chunk_rows:
+            self.write_chunk()
+
+    def write_chunk(self):
+        if not self.rows:
+            return
+        arrays = {f"c{i}": np.concatenate([batch[i] for batch in self.batches]) for i in range(len(self.schema))}
+        path = os.path.join(self.directory, f"chunk_{self.chunks:06d}.npz")
+        with open(path + ".tmp", "wb") as f:
+            np.savez_compressed(f, **arrays)
+        os.replace(path + ".tmp", path)   # a reader never sees a partial chunk
+        self.chunks += 1
+        self.batches, self.rows = [], 0
+
+    def close(self):
+        self.write_chunk()
+
+
+def load_columns(log_path):
+    """{column: array} of a <log>.cols store (the CSV path or the store directory)."""
+    directory = store_path(log_path)
+    with open(os.path.join(directory, "schema.json")) as f:
+        schema = json.load(f)
+    if schema["version"] != STORE_VERSION:
+        raise ValueError(f"Unsupported metrics store version {schema['version']} in {directory}")
+    names = [name for name, _ in schema["columns"]]
+    parts = [[] for _ in names]
+    for chunk_path in sorted(glob.glob(os.path.join(directory, "chunk_*.npz"))):
+        with np.load(chunk_path) as chunk:
+            for i in range(len(names)):
+                parts[i].append(chunk[f"c{i}"])
+    return {name: (np.concatenate(part) if part else np.empty(0, dtype=dtype))
+            for name, (_, dtype), part in zip(names, schema["columns"], parts)}
+
+
+def has_store(log_path):
+    """True if the log has a columnar store with at least one chunk."""
+    return bool(glob.glob(os.path.join(store_path(log_path), "chunk_*.npz")))
+
+
+def load_metrics(log_path):
+    """pandas DataFrame of a log: from its columnar store when there is one, else from the CSV."""
+    import pandas as pd
+
+    if has_store(log_path):
+        return pd.DataFrame(load_columns(log_path))
+    return pd.read_csv(log_path)
@@ -0,0 +1,85 @@
+'''
+# Date: 2026-10-18
+# Lab: LERIS/UFSCar
+# Project: CGReplay
+# Module: Common (CG Server + Player) / CPU Placement
+# CPU sets per role (config placement.server / placement.player) instead of pinning the whole process
+# to CPU 0. Linux affinity is per thread and inherited by the threads a thread creates, so:
+#   pin(role)          : the calling thread (e.g. the Python control loop)
+#   spawning(role)     : threads created inside the block (GStreamer pipeline threads, log/frame writers)
+#   initializer(role)  : pool workers (thread or process pool initializer)
+# The placement is recorded in the run metadata JSON of the endpoint.
+'''
+
+import functools, json, os, platform, socket, time
+from contextlib import contextmanager
+
+
+def parse_cpus(spec, available):
+    """"all" / None -> every available CPU; 3 -> {3}; "0-3,6" -> {0, 1, 2, 3, 6}; [1, 2] -> {1, 2}."""
+    if spec is None or spec == "all":
+        return set(available)
+    if isinstance(spec, int):
+        cpus = {spec}
+    elif isinstance(spec, (list, tuple)):
+        cpus = {int(cpu) for cpu in spec}
+    else:
+        cpus = set()
+        for part in str(spec).split(","):
+            first, _, last = part.strip().partition("-")
+            cpus.update(range(int(first), int(last or first) + 1))
+    if not cpus <= set(available):
+        raise ValueError(f"CPU set '{spec}' is not within the available CPUs {sorted(available)}")
+    return cpus
+
+
+def _pin_worker(cpus):
+    os.sched_setaffinity(0, cpus)
+
+
+class Placement:
+    """CPU set of each role of one endpoint (role -> CPU spec, see parse_cpus)."""
+
+    def __init__(self, endpoint, roles):
+        self.endpoint = endpoint
+        self.available = os.sched_getaffinity(0)
+        self.cpus = {role: parse_cpus(spec, self.available) for role, spec in roles.items()}
+
+    def pin(self, role):
+        """Pins the calling thread to the CPUs of role."""
+        os.sched_setaffinity(0, self.cpus[role])
+
+    @contextmanager
+    def spawning(self, role):
+        """Threads started inside the block inherit the CPUs of role (the caller's affinity is restored)."""
+        previous = os.sched_getaffinity(0)
+        os.sched_setaffinity(0, self.cpus[role])
+        try:
+            yield
+        finally:
+            os.sched_setaffinity(0, previous)
+
+    def initializer(self, role):
+        """Pool initializer pinning each worker to the CPUs of role (picklable for process pools)."""
+        return functools.partial(_pin_worker, self.cpus[role])
+
+    def describe(self):
+        return {role: sorted(cpus) for role, cpus in self.cpus.items()}
+
+    def write_run_metadata(self, path, **extra):
+        """Writes the run metadata JSON (host, process, available CPUs, placement per role, extra fields)."""
+        metadata = {
+            "endpoint": self.endpoint,
+            "started": time.strftime("%Y-%m-%dT%H:%M:%S"),
+            "host": socket.gethostname(),
+            "pid": os.getpid(),
+            "python": platform.python_version(),
+            "cpu_count": os.cpu_count(),
+            "available_cpus": sorted(self.available),
+            "placement": self.describe(),
+        }
+        metadata.update(extra)
+        os.makedirs(os.path.dirname(path) or ".", exist_ok=True)
+        with open(path, "w") as f:
+            json.dump(metadata, f, indent=2)
+        return metadata
@@ -0,0 +1,92 @@
+'''
+# Date: 2026-10-18
+# Lab: LERIS/UFSCar
+# Project: CGReplay
+# Module: Common (CG Server + Player) / RTP Frame Metadata
+# Out-of-band frame metadata carried in an RFC 8285 one-byte RTP header extension, on every RTP
+# packet of the frame (the payloader output), instead of (or next to) the frame tag in the pixels.
+#   element ext_id     (12 bytes): frame_id u32 | width u16 | height u16 | bitrate u32 (kbps)
+#   element ext_id + 1 ( 8 bytes): send_time f64 (server time.perf_counter() when the frame was loaded)
+# A one-byte element carries at most 16 bytes, hence the two elements.
+'''
+
+import struct
+from collections import namedtuple
+
+ONE_BYTE_PROFILE = 0xBEDE
+RTP_HEADER_SIZE = 12
+FRAME_ELEMENT = struct.Struct("!IHHI")
+TIMING_ELEMENT = struct.Struct("!d")
+
+FrameMetadata = namedtuple("FrameMetadata", "frame_id send_time width height bitrate")
+
+
+def check_ext_id(ext_id):
+    """ext_id and ext_id + 1 must both be valid one-byte IDs (1..14)."""
+    if not 1 <= ext_id <= 13:
+        raise ValueError(f"RTP header extension ID {ext_id} out of range (1..13)")
+    return ext_id
+
+
+def pack_metadata(metadata, ext_id=1):
+    """FrameMetadata -> [(id, bytes)] header extension elements."""
+    return [(ext_id, FRAME_ELEMENT.pack(metadata.frame_id, metadata.width, metadata.height, int(metadata.bitrate))),
+            (ext_id + 1, TIMING_ELEMENT.pack(metadata.send_time))]
+
+
+def unpack_metadata(elements, ext_id=1):
+    """{id: bytes} header extension elements -> FrameMetadata (None if the frame element is missing)."""
+    frame = elements.get(ext_id)
+    if frame is None or len(frame) != FRAME_ELEMENT.size:
+        return None
+    frame_id, width, height, bitrate = FRAME_ELEMENT.unpack(frame)
+    timing = elements.get(ext_id + 1)
+    send_time = TIMING_ELEMENT.unpack(timing)[0] if timing is not None and len(timing) == TIMING_ELEMENT.size else None
+    return FrameMetadata(frame_id, send_time, width, height, bitrate)
+
+
+def read_header_extension(packet):
+    """{id: bytes} of the one-byte header extension elements of an RTP packet ({} if it has none)."""
+    if len(packet) < RTP_HEADER_SIZE or not packet[0] & 0x10:
+        return {}
+    start = RTP_HEADER_SIZE + 4 * (packet[0] & 0x0F)
+    if len(packet) < start + 4:
+        return {}
+    profile, words = struct.unpack_from("!HH", packet, start)
+    if profile != ONE_BYTE_PROFILE:
+        return {}
+    elements, offset, end = {}, start + 4, min(start + 4 + 4 * words, len(packet))
+    while offset < end:
+        ext_id, length = packet[offset] >> 4, (packet[offset] & 0x0F) + 1
+        if ext_id == 0:         # padding byte
+            offset += 1
+            continue
+        if ext_id == 15:        # reserved: stop parsing (RFC 8285 4.2)
+            break
+        elements[ext_id] = bytes(packet[offset + 1:offset + 1 + length])
+        offset += 1 + length
+    return elements
+
+
+def add_header_extension(packet, elements):
+    """Returns a copy of the RTP packet with the one-byte header extension elements [(id, bytes)] added
+    (merged with the packet's own one-byte extension, if any)."""
+    first = packet[0]
+    header_end = RTP_HEADER_SIZE + 4 * (first & 0x0F)
+    payload_start = header_end
+    merged = {}
+    if first & 0x10:
+        profile, words = struct.unpack_from("!HH", packet, header_end)
+        if profile != ONE_BYTE_PROFILE:
+            raise ValueError(f"Cannot merge with RTP header extension profile {profile:#06x}")
+        merged = read_header_extension(packet)
+        payload_start = header_end + 4 + 4 * words
+    merged.update(elements)
+
+    body = bytearray()
+    for ext_id, data in merged.items():
+        body.append((ext_id << 4) | (len(data) - 1))
+        body += data
+    body += bytes(-len(body) % 4)
+    return (bytes([first | 0x10]) + bytes(packet[1:header_end]) +
+            struct.pack("!HH", ONE_BYTE_PROFILE, len(body) // 4) + body + bytes(packet[payload_start:]))
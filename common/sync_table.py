@@ -0,0 +1,192 @@
+'''
+# Date: 2026-10-18
+# Lab: LERIS/UFSCar
+# Project: CGReplay
+# Module: Common (CG Server + Player) / Sync Table
+# The frame/command sync file (syncs/*.txt or its binary form syncs/*.bin) loaded once into contiguous
+# arrays with a dense frame ID -> (offset, count) index, so that per-frame/per-message lookups are
+# O(1) and allocation-free.
+#
+# Binary sync format (little-endian, sections padded to 8 bytes):
+#   header  : magic "CGRSYNC1" | version u16 | flags u16 | rows u32 | digest_size u16 |
+#             n_axes u16 | n_buttons u16 | reserved u16 | payload_size u32 | reserved u32   (32 bytes)
+#   ids     : uint32[rows]                       frame ID of each command (sorted)
+#   digests : uint8[rows][digest_size]           raw SHAKE-128 digests (45 bytes = the 90 hex chars)
+#   payload : (float32[n_axes], uint8[n_buttons])[rows]   packed joystick state, if flags & FLAG_PAYLOAD
+'''
+
+import ast, mmap, struct
+import numpy as np
+
+SYNC_MAGIC = b"CGRSYNC1"
+SYNC_VERSION = 1
+SYNC_HEADER = struct.Struct("<8sHHIHHHHII")
+DIGEST_SIZE = 45
+FLAG_PAYLOAD = 0x1
+
+
+def load_syncfile(file_path):
+    """Parses a text sync file (ID,command,encrypted_cmd) and returns (ids, commands, encrypted_cmds)."""
+    ids, commands, encrypted_cmds = [], [], []
+    with open(file_path, 'r') as file:
+        next(file)  # Skip the header line
+        for line in file:
+            # Split only on the last comma to avoid splitting inside the 'command' field
+            parts = line.rsplit(',', 1)
+            if len(parts) == 2:
+                id_and_command, encrypted_cmd = parts
+                # Split the ID from the command part
+                id_str, command_str = id_and_command.split(',', 1)
+                ids.append(int(id_str))
+                commands.append(command_str)
+                encrypted_cmds.append(encrypted_cmd.strip())
+    return ids, commands, encrypted_cmds
+
+
+def hex_to_digests(encrypted_cmds, digest_size=DIGEST_SIZE):
+    """Hex digests (90 chars) -> uint8[rows][digest_size] raw digests."""
+    raw = b"".join(bytes.fromhex(h) for h in encrypted_cmds)
+    if len(raw) != len(encrypted_cmds) * digest_size:
+        raise ValueError(f"Sync digests must be {digest_size} bytes ({2 * digest_size} hex chars)")
+    return np.frombuffer(raw, dtype=np.uint8).reshape(len(encrypted_cmds), digest_size)
+
+
+def payload_dtype(n_axes, n_buttons):
+    return np.dtype([("axes", "<f4", (n_axes,)), ("buttons", "u1", (n_buttons,))])
+
+
+def _pad8(size):
+    return (size + 7) & ~7
+
+
+def write_binary_syncfile(file_path, ids, encrypted_cmds, commands=None):
+    """Writes the binary sync file; `commands` (joystick dict strings) adds the packed axes/buttons payload."""
+    order = np.argsort(np.asarray(ids, dtype=np.int64), kind="stable")
+    ids = np.asarray(ids, dtype=np.uint32)[order]
+    digests = hex_to_digests([encrypted_cmds[i] for i in order])
+
+    flags, n_axes, n_buttons, payload = 0, 0, 0, None
+    if commands is not None:
+        states = [ast.literal_eval(commands[i]) for i in order]
+        n_axes = max(len(s["axes"]) for s in states) if states else 0
+        n_buttons = max(len(s["buttons"]) for s in states) if states else 0
+        payload = np.zeros(len(states), dtype=payload_dtype(n_axes, n_buttons))
+        for row, state in enumerate(states):
+            for key, value in state["axes"].items():
+                payload["axes"][row, int(key)] = value
+            for key, value in state["buttons"].items():
+                payload["buttons"][row, int(key)] = value
+        flags |= FLAG_PAYLOAD
+    payload_size = payload.dtype.itemsize if payload is not None else 0
+
+    with open(file_path, "wb") as f:
+        f.write(SYNC_HEADER.pack(SYNC_MAGIC, SYNC_VERSION, flags, len(ids), DIGEST_SIZE,
+                                 n_axes, n_buttons, 0, payload_size, 0))
+        for section in (ids, digests, payload):
+            if section is None:
+                continue
+            data = section.tobytes()
+            f.write(data)
+            f.write(b"\0" * (_pad8(len(data)) - len(data)))
+    return len(ids)
+
+
+def read_binary_syncfile(file_path):
+    """Memory-maps a binary sync file; returns (ids, digests, payload) as zero-copy numpy views."""
+    with open(file_path, "rb") as f:
+        buf = mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ)
+
+    magic, version, flags, rows, digest_size, n_axes, n_buttons, _, payload_size, _ = SYNC_HEADER.unpack_from(buf, 0)
+    if magic != SYNC_MAGIC or version != SYNC_VERSION:
+        raise ValueError(f"{file_path}: not a CGReplay binary sync file (v{SYNC_VERSION})")
+
+    offset = SYNC_HEADER.size
+    ids = np.frombuffer(buf, dtype="<u4", count=rows, offset=offset)
+    offset += _pad8(ids.nbytes)
+    digests = np.frombuffer(buf, dtype=np.uint8, count=rows * digest_size, offset=offset).reshape(rows, digest_size)
+    offset += _pad8(digests.nbytes)
+    payload = None
+    if flags & FLAG_PAYLOAD:
+        dtype = payload_dtype(n_axes, n_buttons)
+        if dtype.itemsize != payload_size:
+            raise ValueError(f"{file_path}: payload size {payload_size} does not match {n_axes} axes/{n_buttons} buttons")
+        payload = np.frombuffer(buf, dtype=dtype, count=rows, offset=offset)
+    return ids, digests, payload
+
+
+def is_binary_syncfile(file_path):
+    with open(file_path, "rb") as f:
+        return f.read(len(SYNC_MAGIC)) == SYNC_MAGIC
+
+
+class SyncTable:
+    """Commands of the sync file grouped by frame ID.
+
+    ids            : frame ID of each command row (sorted, i.e. the expected command order)
+    digests        : raw digest of each command row, uint8[rows][45], contiguous
+    encrypted      : hex digest of each command row (the text wire format), built lazily for binary files
+    payload        : packed axes/buttons of each row (binary files with payload only)
+    offset / count : dense index, commands of frame f are rows offset[f]:offset[f] + count[f]
+    """
+
+    def __init__(self, ids, digests=None, encrypted=None, commands=None, payload=None):
+        ids = np.asarray(ids)
+        if len(ids) > 1 and not np.all(ids[:-1] <= ids[1:]):
+            # The capture files are already sorted: only unsorted tables pay for a reordering copy
+            order = np.argsort(ids, kind="stable")
+            ids = ids[order]
+            digests = None if digests is None else digests[order]
+            encrypted = None if encrypted is None else [encrypted[i] for i in order]
+            commands = None if commands is None else [commands[i] for i in order]
+            payload = None if payload is None else payload[order]
+
+        self.ids = ids
+        self.digests = hex_to_digests(encrypted) if digests is None else digests
+        self._encrypted = None if encrypted is None else np.asarray(encrypted)
+        self.commands = commands
+        self.payload = payload
+
+        frame_ids, offsets, counts = np.unique(self.ids, return_index=True, return_counts=True)
+        self.frame_ids = frame_ids
+        size = int(frame_ids[-1]) + 1 if len(frame_ids) else 0
+        self.offset = np.zeros(size, dtype=np.int64)
+        self.count = np.zeros(size, dtype=np.int64)
+        self.offset[frame_ids] = offsets
+        self.count[frame_ids] = counts
+
+    @classmethod
+    def load(cls, file_path, keep_commands=False):
+        """Loads a text (syncs/*.txt) or binary (converted with tools/convert_syncfile.py) sync file."""
+        if is_binary_syncfile(file_path):
+            ids, digests, payload = read_binary_syncfile(file_path)
+            return cls(ids, digests=digests, payload=payload)
+        ids, commands, encrypted_cmds = load_syncfile(file_path)
+        return cls(ids, encrypted=encrypted_cmds, commands=commands if keep_commands else None)
+
+    @property
+    def encrypted(self):
+        if self._encrypted is None:
+            self._encrypted = np.asarray([d.tobytes().hex() for d in self.digests])
+        return self._encrypted
+
+    def __len__(self):
+        return len(self.ids)
+
+    def lookup(self, frame_id):
+        """Returns (offset, count) of the commands of frame_id ((0, 0) if it has none)."""
+        if 0 <= frame_id < len(self.count):
+            return int(self.offset[frame_id]), int(self.count[frame_id])
+        return 0, 0
+
+    def command_count(self, frame_id):
+        return int(self.count[frame_id]) if 0 <= frame_id < len(self.count) else 0
+
+    def encrypted_cmds(self, frame_id):
+        """View (no copy) over the hex digests of the commands of frame_id."""
+        offset, count = self.lookup(frame_id)
+        return self.encrypted[offset:offset + count]
+
+    def raw_digests(self, frame_id):
+        """View (no copy) over the raw 45-byte digests of the commands of frame_id."""
+        offset, count = self.lookup(frame_id)
+        return self.digests[offset:offset + count]
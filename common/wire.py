@@ -0,0 +1,152 @@
+'''
+# Date: 2026-10-18
+# Lab: LERIS/UFSCar
+# Project: CGReplay
+# Module: Common (CG Server + Player) / Control Message Wire Format
+# Player -> server control messages (Ack, Nack, command):
+#   binary (default, v1, network byte order):
+#     magic u8 (0xC6) | version u8 | type u8 | flags u8 | session_id u16 | n_digests u16 |
+#     frame_id u32 | number u32 | send_time f64 | fps f64 | cps f64          (40 bytes)
+#     + n_digests x 45-byte raw command digests
+#   text (compatibility): "timestamp,encrypted_cmd,frame_id,type,number,fps,cps"
+# The receiver tells them apart by the first byte (a text message starts with a digit).
+# Clock sync (common/clock_sync.py), binary only, same 40-byte header without digests:
+#   SYNC_REQUEST (player -> server): frame_id = sequence, send_time = t1
+#   SYNC_REPLY   (server -> player): the request's fields + fps = t2 (received), cps = t3 (replied)
+# A batched datagram carries several messages: back to back (binary, self-delimiting) or separated
+# by RECORD_SEPARATOR (text).
+'''
+
+import struct
+from collections import namedtuple
+from enum import IntEnum
+
+RECORD_SEPARATOR = b"\x1e"  # ASCII record separator: never part of a text message
+
+WIRE_FORMATS = ("binary", "text")
+WIRE_MAGIC = 0xC6
+WIRE_VERSION = 1
+WIRE_HEADER = struct.Struct("!BBBBHHIIddd")
+DIGEST_SIZE = 45
+
+
+class MessageType(IntEnum):
+    ACK = 1
+    NACK = 2
+    COMMAND = 3
+    SYNC_REQUEST = 4
+    SYNC_REPLY = 5
+
+
+# Message type <-> the names used by the text format and the server logic (clock sync messages are
+# answered by the control receiver and never reach decode_message)
+TYPE_NAMES = {MessageType.ACK: 'Ack', MessageType.NACK: 'Nack', MessageType.COMMAND: 'command'}
+TYPE_IDS = {name: message_type for message_type, name in TYPE_NAMES.items()}
+
+# cmd is a memoryview over the raw digests (binary) or the encrypted_cmd text field (text)
+ControlMessage = namedtuple("ControlMessage", "send_time cmd frame_id type number fps cps session_id")
+SyncMessage = namedtuple("SyncMessage", "type seq t1 t2 t3 session_id")
+
+
+def encode_text_message(timestamp, encrypted_cmd, frame_id, type, number, fps, cps):
+    return f"{timestamp},{encrypted_cmd},{frame_id},{type},{number},{fps},{cps}".encode()
+
+
+def digest_count(digests):
+    """Number of raw digests in a uint8[n][45] array (None or anything else = no digest)."""
+    return len(digests) if getattr(digests, "ndim", 0) == 2 else 0
+
+
+def binary_message_size(digests):
+    return WIRE_HEADER.size + digest_count(digests) * DIGEST_SIZE
+
+
+def encode_binary_message(buffer, offset, timestamp, digests, frame_id, type, number, fps, cps, session_id=0):
+    """Packs a binary message into buffer at offset (no allocation); returns the message size.
+
+    digests: uint8[n][45] array of raw command digests (None or anything else = no digest).
+    """
+    n_digests = digest_count(digests)
+    WIRE_HEADER.pack_into(buffer, offset, WIRE_MAGIC, WIRE_VERSION, TYPE_IDS[type], 0, session_id,
+                          n_digests, frame_id, number, timestamp, fps, cps)
+    size = WIRE_HEADER.size
+    if n_digests:
+        digest_bytes = n_digests * DIGEST_SIZE
+        memoryview(buffer)[offset + size:offset + size + digest_bytes] = digests.reshape(-1)
+        size += digest_bytes
+    return size
+
+
+def decode_message(data):
+    """Parses one control message (binary or text) into a ControlMessage; the binary digests are not copied.
+
+    Raises ValueError for a malformed message (empty, truncated header or digests, bad text fields).
+    """
+    if not len(data):
+        raise ValueError("Empty control message")
+    if data[0] == WIRE_MAGIC:
+        if len(data) < WIRE_HEADER.size:
+            raise ValueError(f"Truncated control message header ({len(data)} < {WIRE_HEADER.size} bytes)")
+        (_, version, message_type, _, session_id, n_digests,
+         frame_id, number, send_time, fps, cps) = WIRE_HEADER.unpack_from(data, 0)
+        if version != WIRE_VERSION:
+            raise ValueError(f"Unsupported control message version {version}")
+        end = WIRE_HEADER.size + n_digests * DIGEST_SIZE
+        if len(data) < end:
+            raise ValueError(f"Truncated control message ({len(data)} < {end} bytes)")
+        digests = memoryview(data)[WIRE_HEADER.size:end]
+        return ControlMessage(send_time, digests, frame_id, TYPE_NAMES[MessageType(message_type)],
+                              number, fps, cps, session_id)
+
+    # Text: the command field may itself contain commas, so split the fixed fields from both ends
+    send_time, rest = data.decode().split(',', 1)
+    cmd, frame_id, message_type, number, fps, cps = rest.rsplit(',', 5)
+    return ControlMessage(send_time, cmd, int(frame_id), message_type, int(number), float(fps), float(cps), 0)
+
+
+def encode_sync_message(type, seq, t1, t2=0.0, t3=0.0, session_id=0):
+    """Packs a clock sync request/reply (type: MessageType.SYNC_REQUEST or SYNC_REPLY)."""
+    return WIRE_HEADER.pack(WIRE_MAGIC, WIRE_VERSION, type, 0, session_id, 0, seq, 0, t1, t2, t3)
+
+
+def is_sync_message(data, type=MessageType.SYNC_REQUEST):
+    return len(data) >= WIRE_HEADER.size and data[0] == WIRE_MAGIC and data[2] == type
+
+
+def decode_sync_message(data):
+    (_, version, message_type, _, session_id, _, seq, _, t1, t2, t3) = WIRE_HEADER.unpack_from(data, 0)
+    if version != WIRE_VERSION:
+        raise ValueError(f"Unsupported control message version {version}")
+    return SyncMessage(MessageType(message_type), seq, t1, t2, t3, session_id)
+
+
+def peek_session_id(data):
+    """session_id of a binary message without decoding it (text messages and runt datagrams have none: 0)."""
+    if len(data) >= 6 and data[0] == WIRE_MAGIC:
+        return struct.unpack_from("!H", data, 4)[0]
+    return 0
+
+
+def split_datagram(data):
+    """Splits a (possibly batched) datagram into its messages (zero-copy views for binary).
+
+    Raises ValueError for an empty datagram or a binary one shorter than a message header.
+    """
+    if not len(data):
+        raise ValueError("Empty control datagram")
+    if data[0] == WIRE_MAGIC:
+        if len(data) < WIRE_HEADER.size:
+            raise ValueError(f"Truncated control datagram ({len(data)} < {WIRE_HEADER.size} bytes)")
+        n_digests = struct.unpack_from("!H", data, 6)[0]
+        if WIRE_HEADER.size + n_digests * DIGEST_SIZE >= len(data):
+            return [data]
+        view, messages, offset = memoryview(data), [], 0
+        while offset + WIRE_HEADER.size <= len(data):
+            n_digests = struct.unpack_from("!H", data, offset + 6)[0]
+            end = offset + WIRE_HEADER.size + n_digests * DIGEST_SIZE
+            messages.append(view[offset:end])
+            offset = end
+        return messages
+    if RECORD_SEPARATOR in data:
+        return data.split(RECORD_SEPARATOR)
+    return [data]
@@ -6,20 +6,33 @@
 # Gamer: (1) 
 '''
 
-import cv2, os, socket, time, yaml, threading, subprocess, glob
-import pandas as pd
+import cv2, os, sys, socket, time, yaml, threading, subprocess, glob
 from datetime import datetime
-from pyzbar import pyzbar
 from collections import deque
 
-
-os.sched_setaffinity(0, {0})
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")) # CGReplay root (common modules)
+from common.sync_table import SyncTable
+from common.frame_tags import make_frame_tag
+from common.buffered_log import BufferedLog
+from common.metrics_store import SCHEMAS
+from common.log import PeriodicSummary, get_logger, setup_logging
+from common.placement import Placement
+from common.clock_sync import ClockSync
+from modules.command_channel import CommandChannel
+from modules.frame_id_detector import FrameIdDetector
+from modules.frame_pipeline import FramePipeline
+from modules.gst_capture import GstCapture
+from modules.frame_sink import FrameSink
 
 # Load configuration from YAML file
 with open("../config/config.yaml", "r") as file:
 #with open("/home/alireza/CG_Repository/CGReplay/config/config.yaml") as file:
     config = yaml.safe_load(file)
 
+# CPU placement (placement.player): the control loop here, the receiver/decoder/writer threads when spawned
+placement = Placement("player", config["placement"]["player"])
+placement.pin("control_loop")
+
 # game name
 game_name = config["Running"]["game"]
 stop_frm_number = config["Running"]["stop_frm_number"]
@@ -33,6 +46,24 @@ cg_server_port = config["server"]["server_port"]    # Port for receiving control
 player_ip = config['gamer']["player_IP"]                     # CG Gamer IP address
 player_port =config['gamer']["player_streaming_port"]       # UDP Port for streaming video to Gamer
 my_command_port = config['gamer']["palyer_command_port"]
+batch_commands = config['gamer']["batch_commands"]          # Send the messages of a frame in one datagram
+decoder_workers = config['gamer']["decoder_workers"]        # Frame ID (QR) decoding workers
+decoder_pool = config['gamer']["decoder_pool"]              # "thread" or "process" pool
+decoder_queue = config['gamer']["decoder_queue"]            # Max frames being decoded at once
+receiver_backend = config['gamer']["receiver"]              # "gst" (native appsink callback) or "opencv" (cv2.VideoCapture)
+appsink_max_buffers = config['gamer']["appsink_max_buffers"] # Frames queued between GStreamer and the receive loop
+appsink_drop = config['gamer']["appsink_drop"]              # Drop the oldest frame when the queue is full (else block)
+stream_timeout = config['gamer']["stream_timeout"]          # Seconds of failed reads in a row before the end of stream (0 = never)
+qr_size = config["overlay"]["qr_size"]                      # QR code placed by the server in the bottom-right corner
+qr_padding = config["overlay"]["padding"]
+roi_margin = config["overlay"]["roi_margin"]                # Extra pixels scanned around the expected QR position
+roi_fallback = config["overlay"]["roi_fallback"]            # Scan the full frame when the QR is not found in the ROI
+frame_tag_name = config["overlay"]["tag"]                   # Frame ID tag: "qr" or "strip" (block pattern)
+strip_block = config["overlay"]["strip_block"]
+wire_format = config["protocols"]["wire_format"]            # Control messages: "binary" (default) or "text" (compatibility)
+rtp_metadata = config["protocols"]["rtp_metadata"]["enabled"] and not config["protocols"]["SCReAM"] # Frame metadata from the RTP header extension
+rtp_metadata_ext_id = config["protocols"]["rtp_metadata"]["ext_id"]
+rtp_metadata_validate = config["protocols"]["rtp_metadata"]["validate"] # Also decode the frame tag and cross-check it
 
 # sync setup
 folder_path = config[game_name]["frames"] 
@@ -42,7 +73,11 @@ sync_file = config[game_name]["sync_file"]
 rate_log = config["gamer"]["player_rate_log"] 
 time_log = config["gamer"]["player_time_log"]
 frame_log = config["gamer"]["player_frame_log"]
+stages_log = config["gamer"]["player_stages_log"]           # Stage timestamps of each frame (latency waterfall)
+clock_log = config["gamer"]["player_clock_log"]             # Clock sync samples
+clock_sync_config = config["clock_sync"]                    # Offset of the server clock (common/clock_sync.py)
 received_frames = config["gamer"]["received_frames"]
+frame_sink_config = config["gamer"]["frame_sink"]           # Background writer of the received frames
 
 
 '''
@@ -51,25 +86,19 @@ Referesh Logs
 
 [os.remove(f) for f in glob.glob(received_frames+"/*") if os.path.isfile(f)]
 
-# Remove rate_Control log
-if os.path.exists(rate_log):
-    os.remove(rate_log)
-
-# Remove server log
-if os.path.exists(time_log):
-    os.remove(time_log)
-
-# Remove frame Log
-if os.path.exists(frame_log):
-    os.remove(frame_log)
-
-# Create new logs with headers
-with open(rate_log, "w") as f:
-    f.write("frame_id,fps,cps\n")
-with open(time_log, "w") as f:
-    f.write("frame_id,frame_timestamp,cmd_timestamp\n")
-with open(frame_log, "w") as f:
-    f.write("frame_id,frame_counter,fps,retry_status\n")
+# Create new logs with headers (one buffered writer per log, flushed in the background)
+log_rows = config["logging"]["buffer_rows"]
+log_flush_interval = config["logging"]["flush_interval"]
+log_options = (log_rows, log_flush_interval, config["logging"]["formats"], config["logging"]["chunk_rows"])
+setup_logging(config["logging"]["level"])   # Console: DEBUG = per-frame lines, INFO = summaries
+log = get_logger("player")
+with placement.spawning("writers"): # log flusher threads
+    rate_logger = BufferedLog(rate_log, SCHEMAS["player_rate"], *log_options)
+    time_logger = BufferedLog(time_log, SCHEMAS["player_time"], *log_options)
+    # FID, FPS, Retry Status [noremal:0, retry:1, No_QR:2]
+    frame_logger = BufferedLog(frame_log, SCHEMAS["player_frame"], *log_options)
+    stages_logger = BufferedLog(stages_log, SCHEMAS["player_stages"], *log_options)
+    clock_logger = BufferedLog(clock_log, SCHEMAS["player_clock_sync"], *log_options)
 
 
 
@@ -93,21 +122,6 @@ myrtp = config["encoding"][MyvideoEncoder]["Depacketization"]
 scream_state=config["protocols"]["SCReAM"]   
 scream_receiver=config["protocols"]["receiver"]
 
-# Custom function to load autocommands.txt while handling the complex 'command' field
-def load_syncfile(file_path):
-    autocommands = []
-    with open(file_path, 'r') as file:
-        next(file)  # Skip the header line
-        for line in file:
-            # Split only on the last comma to avoid splitting inside the 'command' field
-            parts = line.rsplit(',', 1)
-            if len(parts) == 2:
-                id_and_command, encrypted_cmd = parts
-                # Split the ID from the command part
-                id_str, command_str = id_and_command.split(',', 1)
-                autocommands.append((int(id_str), command_str, encrypted_cmd.strip()))
-    return pd.DataFrame(autocommands, columns=['ID', 'command', 'encrypted_cmd'])
-
 # Global variable to store latest frame
 latest_frame = None
 lock = threading.Lock()
@@ -133,7 +147,7 @@ if live_watching == True:
     display_thread.start()
 
 # Load autocommand.txt
-sync_df = load_syncfile(sync_file)
+sync_table = SyncTable.load(sync_file) # frame ID -> commands index
 
 # kill all ports
 subprocess.run("../port_clean.sh")
@@ -145,21 +159,25 @@ with open("/tmp/player_ready", "w") as f:
 
 print(f"palyer is ready to receive {player_port} & command sent on {my_command_port}")
 
+# Clock sync with the server (NTP-style, over its control port): puts the stage timestamps of both hosts on the server's clock
+clock_sync = None
+if clock_sync_config["enabled"]:
+    clock_sync = ClockSync((player_ip, clock_sync_config["local_port"]), (cg_server_ip, my_command_port), clock_sync_config["interval"],
+                           clock_sync_config["burst"], clock_sync_config["window"], clock_sync_config["timeout"],
+                           config["gamer"]["session_id"], lambda *sample: clock_logger.log(*sample[:5], sample[5] * 1000, sample[6] * 1000)).start()
+    if clock_sync.wait(clock_sync_config["wait"]):
+        print(f"Clock sync: server offset {clock_sync.offset * 1000:.3f} ms (RTT {clock_sync.rtt * 1000:.3f} ms)")
+    else:
+        print("⚠️  Clock sync: no reply from the server yet (timestamps stay in the player clock until one arrives)")
+
+# Persistent command channel: one socket bound once to the player IP + streaming port (Pure UDP)
+command_channel = CommandChannel((player_ip, player_port), (cg_server_ip, my_command_port), batch=batch_commands, wire_format=wire_format,
+                                 session_id=config["gamer"]["session_id"]) # routes our messages on a multi-session server
+
 # Function to send command to server (Pure UDP)
 
 def send_command(frame_id, encrypted_cmd, interface_name= player_interface, type='command', number = 0, fps = 0, cps = 0): # #"enp0s31f6" wlp0s20f3
-    sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
-    sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
-    #sock.setsockopt(socket.SOL_SOCKET, socket.SO_BINDTODEVICE, interface_name.encode()) #interface_name.encode()) #interface_name.encode())
-    sock.bind((player_ip, player_port))   # player IP + player port to receive the video 
-    timestamp = time.perf_counter() #time.time() * 1000
-    message = f"{timestamp},{encrypted_cmd},{frame_id},{type},{number},{fps},{cps}"
-    # port setup
-    #my_test_port = 5555
-    sock.sendto(message.encode(),(cg_server_ip, my_command_port))
-    #print("***"+player_interface+"***")
-    
-    sock.close()
+    command_channel.send(frame_id, encrypted_cmd, type=type, number=number, fps=fps, cps=cps)
 '''
 import struct
 # Function to send command to server (RTP over UDP)
@@ -188,35 +206,15 @@ def send_command(frame_id, encrypted_cmd, interface_name=player_interface, type=
     sock.sendto(rtcp_packet, (cg_server_ip, my_command_port))
     sock.close()
 '''
-# Function to read the QR code from the frame
-def read_qr_code_from_frame(frame):
-    """Reads the QR code from a given frame and extracts its data."""
-    gray_frame = cv2.cvtColor(frame, cv2.COLOR_BGR2GRAY)
-    blurred_frame = cv2.GaussianBlur(gray_frame, (5, 5), 0)
-    qr_codes = pyzbar.decode(blurred_frame)
-
-    for qr in qr_codes:
-        qr_data = qr.data.decode('utf-8')
-        print(f"Detected QR Code Data: {qr_data}")
-        data_parts = qr_data.split(',')
-        frame_id = None
-        for part in data_parts:
-            if "ID:" in part:
-                frame_id = part.split(':')[1].strip()
-                break
-        if frame_id:
-            return int(frame_id), qr_data
-
-    return -1, None
 
 
 
 if scream_state==False:
     # GStreamer pipeline to receive video stream from port 5000
-    
+    # (the depayloader is named to read the RTP header extension metadata, the appsink for the native receiver)
     gstreamer_pipeline = (
          f"udpsrc port={player_port} ! application/x-rtp, payload=96 ! "
-        f"queue max-size-time=1000000000 ! {myrtp} ! {mydecoder} ! videoconvert ! appsink"
+        f"queue max-size-time=1000000000 ! {myrtp} name=depay ! {mydecoder} ! videoconvert ! appsink name=sink"
     )
     '''
     gstreamer_pipeline = (
@@ -229,8 +227,12 @@ else:
     gstreamer_pipeline = receiver_output.stdout.strip()  # Remove any extra whitespace
     print(f"Using GStreamer pipeline: {gstreamer_pipeline}")
 
-# Open the video stream using OpenCV and GStreamer
-cap = cv2.VideoCapture(gstreamer_pipeline, cv2.CAP_GSTREAMER)
+# Open the video stream: native GStreamer appsink receiver (default) or OpenCV VideoCapture
+with placement.spawning("receiver"): # GStreamer receive/decode threads
+    if receiver_backend == "gst" or rtp_metadata: # the RTP metadata is only readable by the native receiver
+        cap = GstCapture(gstreamer_pipeline, rtp_metadata_ext_id if rtp_metadata else None, appsink_max_buffers, appsink_drop)
+    else:
+        cap = cv2.VideoCapture(gstreamer_pipeline, cv2.CAP_GSTREAMER)
 
 if not cap.isOpened():
     print("❌ ERROR: Could not open video stream")
@@ -293,32 +295,61 @@ currrent_cps = 0
 current_fps = 0
 my_try_counter = 0 
 
+# Pipelined receiver: capture thread -> QR decoding workers -> frames back in arrival order
+# Frame ID detection restricted to the QR region (full-frame scan only on a miss)
+detector = FrameIdDetector(make_frame_tag(frame_tag_name, qr_size, strip_block), qr_padding, roi_margin, roi_fallback)
+decode_tag = not rtp_metadata or rtp_metadata_validate # RTP metadata only: no frame tag decoding at all
+with placement.spawning("receiver"): # grab thread; the decoding workers are pinned by their initializer
+    frame_pipeline = FramePipeline(cap, detector.detect if decode_tag else None, decoder_workers, decoder_pool, decoder_queue,
+                                   placement.initializer("tag_decoders"), stream_timeout=stream_timeout).start()
+# Received frames are written in the background (bounded queue, drop policy when the disk falls behind)
+with placement.spawning("writers"):
+    frame_sink = FrameSink(received_frames, frame_sink_config["format"], frame_sink_config["png_compression"],
+                           frame_sink_config["jpeg_quality"], frame_sink_config["ring_size"], frame_sink_config["workers"],
+                           frame_sink_config["queue_size"], frame_sink_config["drop_policy"])
+placement.write_run_metadata(config["placement"]["run_metadata"], decoder=mydecoder, receiver=receiver_backend,
+                             decoder_pool=decoder_pool, session_id=config["gamer"]["session_id"])
+print(f"CPU placement: {placement.describe()} (run metadata: {config['placement']['run_metadata']})")
+metadata_frames = metadata_mismatches = 0 # frames identified by the RTP metadata / whose frame tag disagreed
+# Periodic console summary instead of per-frame lines (those are DEBUG)
+summary = PeriodicSummary(log, ("fps", "cps", "backlog"), config["logging"]["summary_interval"])
+
 while True:
 
     start_time = time.perf_counter() # time.time()
 
-    # Try to receive the next frame
-    ret, frame = cap.read()
-    frm_rcv = time.perf_counter() # time.time() * 1000
+    # Next received frame (arrival timestamp taken by the capture thread) and its decoded QR code
+    ret, frame, frm_rcv, metadata, decoded = frame_pipeline.next()
     #test_timestamp = cap.get(cv2.CAP_PROP_POS_MSEC)
     #print("Debug:***************",test_timestamp)
+    if not ret:
+        if frame_pipeline.ended: # no frame for stream_timeout seconds
+            log.warning("End of stream: no frame received for %s s", frame_pipeline.stream_timeout)
+            break
+        continue
+    frm_detected = frame_pipeline.detect_time or time.perf_counter() # frame ID known (tag decoded, or RTP metadata only)
+    messages_sent = command_channel.sent
 
     # Read QR code from the buffered frame
-    frame_id, qr_data = read_qr_code_from_frame(frame)
+    frame_id, qr_data, detect_source = decoded if decoded else (-1, None, None)
+    if decoded:
+        detector.count(detect_source) # ROI hit / full-frame hit / miss
+    if metadata is not None: # RTP header extension: authoritative frame ID, the tag only validates it
+        metadata_frames += 1
+        if decoded and frame_id != -1 and frame_id != metadata.frame_id:
+            metadata_mismatches += 1
+            log.warning("Frame tag %s != RTP metadata %s", frame_id, metadata.frame_id)
+        frame_id = metadata.frame_id
     current_fps = 1/(frm_rcv-frm_previoustime)
     frm_previoustime = frm_rcv
 
-
-    # logging buffer to make it faster
-    log_frame_buffer = []
-    buffer_size = 100  # Write every 100 frames
     previous_frame_id = 0
     # set the display thread!
     with lock:
         latest_frame = frame.copy()  # Update frame for live display
 
     if frame_id:
-        print(f"Detected Frame ID: {frame_id}")
+        log.debug("Detected Frame ID: %s", frame_id)
         #frame_counter = frame_id # Counter for No-QR Code frames
         
 
@@ -337,22 +368,18 @@ while True:
         
         #next_frame = int(frame_id) + 1
 
-        frame_filename = f"{received_frames}/{frame_id:04d}.png"
-
         
 
         if frame_id!=frame_counter and (previous_frame_id+1)!=frame_id and frame_id!=1:
-            print(f"⚠️  Frame ID Mismatch: Expected {frame_counter+1}, but got {frame_id}. Possible frame loss or out-of-order delivery.")
+            log.debug("Frame ID Mismatch: Expected %s, but got %s. Possible frame loss or out-of-order delivery.", frame_counter+1, frame_id)
             # FID, FPS, Retry Status [noremal:0, retry:1, No_QR:2]
-            log_frame_buffer.append(f"{frame_id},{frame_counter},{current_fps},{1}\n")
-            if len(log_frame_buffer) >= buffer_size: open(frame_log, "a").writelines(log_frame_buffer); log_frame_buffer.clear()
+            frame_logger.log(frame_id, frame_counter, current_fps, 1)
             frame_counter = frame_id+1
 
         else:
             previous_frame_id = frame_id
-            cv2.imwrite(frame_filename, frame)
-            log_frame_buffer.append(f"{frame_id},{frame_counter},{current_fps},{0}\n")
-            if len(log_frame_buffer) >= buffer_size: open(frame_log, "a").writelines(log_frame_buffer); log_frame_buffer.clear()
+            frame_sink.submit(frame_id, frame) # encoded & written by the sink workers
+            frame_logger.log(frame_id, frame_counter, current_fps, 0)
             frame_counter = frame_counter + 1
             
 
@@ -387,7 +414,7 @@ while True:
 
         
     else:
-        print("No QR code detected in this frame.")
+        log.debug("No QR code detected in this frame.")
         frame_counter = frame_counter + 1
         send_command(0,"Downgrade",type='Nack',fps = current_fps, cps = currrent_cps )   # Send NacK
         send_command(frame_counter, previous_command,type='command',fps = current_fps, cps = currrent_cps ) # Send the Previous Command
@@ -395,8 +422,7 @@ while True:
         frame_filename = f"{received_frames}/{frame_counter:04d}_NoQR.png"
         # Write logs if buffer is full 
         # FID, FPS, Retry Status [noremal:0, retry:1, No_QR:2]
-        log_frame_buffer.append(f"{frame_id},{frame_counter},{current_fps},{2}\n")
-        if len(log_frame_buffer) >= buffer_size: open(frame_log, "a").writelines(log_frame_buffer); log_frame_buffer.clear()
+        frame_logger.log(frame_id, frame_counter, current_fps, 2)
         #pass
         #frame_counter = frame_counter + 1
     
@@ -406,39 +432,34 @@ while True:
 
    
 
-    matching_command = [] 
-    # Check if there's a matching command for this frame
-    matching_command = sync_df[sync_df['ID'] == frame_counter]
-    cmd_number = matching_command.shape[0]
-    encrypted_cmds = matching_command['encrypted_cmd'].values
+    # Check if there's a matching command for this frame (O(1) index lookup, view over the digests)
+    encrypted_cmds = sync_table.raw_digests(frame_counter) if wire_format == "binary" else sync_table.encrypted_cmds(frame_counter)
+    cmd_number = len(encrypted_cmds)
 
-    print('\n********************************\n')
-    if not matching_command.empty:
+    if cmd_number:
         #print(f"Match found for Frame {frame_counter}")
         
         send_command(frame_counter, encrypted_cmds,type ='command', number = cmd_number, fps = current_fps, cps= currrent_cps)
+        command_channel.flush() # batched messages of this frame leave in one datagram
         cmd_sent = time.perf_counter() # time.time() * 1000
         currrent_cps = 1/(cmd_sent - cmd_previoustime)
         cmd_previoustime = cmd_sent
         #matching_command.apply(lambda row: send_command(frame_counter, encrypted_cmds,number = cmd_number), axis=1)  #row['encrypted_cmd'],number = cmd_number), axis=1)
-        previous_command = encrypted_cmds.copy() # matching_command.iloc[0]['encrypted_cmd']
+        previous_command = encrypted_cmds # the sync table is read-only, no copy needed
         
             # Log frame received time
-        with open(rate_log, "a") as f: # fID - fps - cps
-            f.write(f"{frame_id},{current_fps},{currrent_cps}\n")
-
-
-        with open(time_log, "a") as f: # FID - F timestamp - CMD Timestamp
-            f.write(f"{frame_id},{frm_rcv},{cmd_sent}\n")
+        rate_logger.log(frame_id, current_fps, currrent_cps) # fID - fps - cps
+        time_logger.log(frame_id, frm_rcv, cmd_sent)          # FID - F timestamp - CMD Timestamp
 
 
+    command_channel.flush() # Ack / Nack of this frame (batched mode)
+    if frame_id != -1: # stage timestamps (player clock) + the clock offset to put them on the server's time line
+        frm_responded = time.perf_counter() if command_channel.sent > messages_sent else None
+        stages_logger.log(frame_id, clock_sync.offset if clock_sync else None, clock_sync.rtt if clock_sync else None,
+                          frame_pipeline.depay_time, frm_rcv, frm_detected, frm_responded)
     my_try_counter = my_try_counter + 1
-    print(f'Recieved Frame # is: {my_try_counter}')
-    
-    # Write any remaining in the log
-    if log_frame_buffer:
-        with open(frame_log, "a") as f:
-            f.writelines(log_frame_buffer)
+    log.debug('Recieved Frame # is: %s', my_try_counter)
+    summary.tick(current_fps, currrent_cps, len(frame_pipeline.in_flight.queue)) # one INFO line per summary_interval
 
 
     #if my_try_counter == stop_frm_number or (max((frame_id),0)+1) == stop_frm_number:
@@ -448,5 +469,20 @@ while True:
     #if cv2.waitKey(1) & 0xFF == ord('q'):
         #break
 
+frame_pipeline.stop()
+frame_sink.close()
+frames_submitted, frames_written, frames_dropped, frames_failed = frame_sink.stats()
+print(f"Frame sink ({frame_sink.format}): {frames_written}/{frames_submitted} frames written | dropped {frames_dropped} | failed {frames_failed}")
+frames_scanned, roi_rate, full_rate, miss_rate = detector.stats()
+print(f"Frame ID detection: {frames_scanned} frames | ROI hits {roi_rate:.1%} | full-frame hits {full_rate:.1%} | misses {miss_rate:.1%}")
+if rtp_metadata:
+    print(f"RTP metadata: {metadata_frames} frames identified | frame tag mismatches {metadata_mismatches}")
+command_channel.close()
+if clock_sync:
+    clock_sync.stop()
+    sync_samples, sync_lost, sync_offset, sync_rtt = clock_sync.stats()
+    print(f"Clock sync: {sync_samples} samples | lost {sync_lost} | server offset {sync_offset:.3f} ms | RTT {sync_rtt:.3f} ms")
+for logger in (rate_logger, time_logger, frame_logger, stages_logger, clock_logger):
+    logger.close()
 cap.release()
 cv2.destroyAllWindows()
@@ -0,0 +1,88 @@
+'''
+# Date: 2026-10-18
+# Lab: LERIS/UFSCar
+# Project: CGReplay
+# Module: CG Player / Command Channel
+# One long-lived UDP socket for the player -> server messages (Ack, Nack, command) instead of
+# a socket()/bind()/close() per message.
+'''
+
+import socket, time
+
+from common.wire import (RECORD_SEPARATOR, WIRE_FORMATS, binary_message_size,
+                         encode_binary_message, encode_text_message)
+
+MAX_DATAGRAM = 65507
+
+
+class CommandChannel:
+    """Persistent, pre-bound command socket with an optional batched send.
+
+    wire_format : "binary" (fixed-layout messages packed into a preallocated buffer) or "text".
+    batch=False : every send() is one datagram (the original behaviour).
+    batch=True  : send() appends the message to the preallocated buffer and flush() sends all of
+                  them in one datagram (text messages are separated by RECORD_SEPARATOR).
+    send_time is always the player's clock (the server's delay_gradient policy needs it free of clock
+    offset steps); the offset that maps it to the server clock is in the player's clock sync / stage logs.
+    """
+
+    def __init__(self, local_addr, server_addr, batch=False, wire_format="binary", session_id=0):
+        if wire_format not in WIRE_FORMATS:
+            raise ValueError(f"Unknown wire_format '{wire_format}' (expected one of {WIRE_FORMATS})")
+        self.server_addr = server_addr
+        self.batch = batch
+        self.binary = wire_format == "binary"
+        self.session_id = session_id
+        self.sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        #self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_BINDTODEVICE, interface_name.encode())
+        self.sock.bind(local_addr)   # player IP + player port to receive the video
+
+        self.buffer = bytearray(MAX_DATAGRAM)
+        self.view = memoryview(self.buffer)
+        self.pending = 0             # bytes waiting in the batch buffer
+        self.sent = 0                # messages sent
+        self.datagrams = 0           # datagrams sent
+
+    def send(self, frame_id, cmds, type='command', number=0, fps=0, cps=0):
+        """Sends one message; cmds are the raw digests (binary) or the encrypted_cmd field (text)."""
+        timestamp = time.perf_counter() #time.time() * 1000
+        self.sent += 1
+        if self.binary:
+            if self.batch and self.pending + binary_message_size(cmds) > MAX_DATAGRAM:
+                self.flush()
+            offset = self.pending if self.batch else 0
+            size = encode_binary_message(self.buffer, offset, timestamp, cmds, frame_id, type,
+                                         number, fps, cps, self.session_id)
+            if self.batch:
+                self.pending += size
+            else:
+                self.sock.sendto(self.view[:size], self.server_addr)
+                self.datagrams += 1
+            return
+
+        message = encode_text_message(timestamp, cmds, frame_id, type, number, fps, cps)
+        if not self.batch:
+            self.sock.sendto(message, self.server_addr)
+            self.datagrams += 1
+            return
+
+        size = len(message) + (1 if self.pending else 0)
+        if self.pending + size > MAX_DATAGRAM:
+            self.flush()
+        if self.pending:
+            self.buffer[self.pending] = RECORD_SEPARATOR[0]
+            self.pending += 1
+        self.buffer[self.pending:self.pending + len(message)] = message
+        self.pending += len(message)
+
+    def flush(self):
+        """Sends the batched messages (no-op when nothing is pending or batching is disabled)."""
+        if self.pending:
+            self.sock.sendto(self.view[:self.pending], self.server_addr)
+            self.datagrams += 1
+            self.pending = 0
+
+    def close(self):
+        self.flush()
+        self.sock.close()
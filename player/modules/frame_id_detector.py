@@ -0,0 +1,57 @@
+'''
+# Date: 2026-10-18
+# Lab: LERIS/UFSCar
+# Project: CGReplay
+# Module: CG Player / Frame ID Detection
+# Reads the frame ID that the CG Server stamps on each frame (frame tag in the bottom-right corner).
+'''
+
+from common.frame_tags import QRTag, placement, read_qr_code_from_frame
+
+
+class FrameIdDetector:
+    """Frame ID detection restricted to the region where the server places the frame tag.
+
+    The server overlays the tag `padding` pixels from the bottom-right corner (config: overlay), so
+    only that region is scanned: plus `margin` pixels around it for the QR tag, exactly the tag for
+    the block strip (its position is deterministic). The full frame is scanned only when the region
+    misses, `fallback` is enabled and the tag can be searched for (QR).
+
+    detect() returns (frame_id, qr_data, source) with source "roi", "full" or None (miss, frame_id -1); it keeps
+    no state, so it can run in a thread or process pool, and the caller feeds `source` to count().
+    """
+
+    SOURCES = ("roi", "full", None)
+
+    def __init__(self, tag=None, padding=10, margin=20, fallback=True):
+        self.tag = tag if tag is not None else QRTag()
+        self.padding = padding
+        self.margin = margin if self.tag.search_margin else 0
+        self.fallback = fallback and self.tag.search_margin
+        self.counts = dict.fromkeys(self.SOURCES, 0)
+
+    def roi(self, frame):
+        height, width = frame.shape[:2]
+        x, y = placement(width, height, self.tag.width, self.tag.height, self.padding, self.tag.align)
+        return frame[max(y - self.margin, 0):y + self.tag.height + self.margin,
+                     max(x - self.margin, 0):x + self.tag.width + self.margin]
+
+    def detect(self, frame):
+        frame_id, qr_data = self.tag.read(self.roi(frame))
+        if frame_id != -1:
+            return frame_id, qr_data, "roi"
+        if self.fallback:
+            frame_id, qr_data = read_qr_code_from_frame(frame)
+            if frame_id != -1:
+                return frame_id, qr_data, "full"
+        return -1, None, None
+
+    def count(self, source):
+        self.counts[source] += 1
+
+    def stats(self):
+        """Returns (frames, ROI hit rate, full-frame fallback hit rate, miss rate)."""
+        frames = sum(self.counts.values())
+        if frames == 0:
+            return 0, 0.0, 0.0, 0.0
+        return frames, self.counts["roi"] / frames, self.counts["full"] / frames, self.counts[None] / frames
@@ -0,0 +1,100 @@
+'''
+# Date: 2026-10-18
+# Lab: LERIS/UFSCar
+# Project: CGReplay
+# Module: CG Player / Frame Receive Pipeline
+# grab (capture thread) -> decode frame IDs (worker pool) -> sequencer (frames handed back in arrival order)
+# so that the QR decoding of frame n overlaps the capture of frames n+1, n+2, ...
+'''
+
+import queue, threading, time
+from concurrent.futures import ProcessPoolExecutor, ThreadPoolExecutor
+
+POOLS = ("thread", "process")
+
+
+def _timed(decode_fn, frame):
+    """decode_fn(frame) and the time it finished (perf_counter is system-wide: valid in a process pool)."""
+    decoded = decode_fn(frame)
+    return decoded, time.perf_counter()
+
+
+class FramePipeline:
+    """Pipelined frame receiver.
+
+    The grab thread reads frames from `cap` (anything with read() -> (ret, frame)), timestamps them
+    on arrival (or takes the cap's own receive_time) and submits decode_fn(frame) to a thread or
+    process pool. The futures are queued in arrival order, so next() returns
+    (ret, frame, receive_time, metadata, decode_fn(frame)) in order even when the workers finish out
+    of order. max_in_flight bounds the frames being decoded at once.
+    metadata is the cap's out-of-band frame metadata (GstCapture.metadata, None for cv2.VideoCapture);
+    with decode_fn=None nothing is decoded (decoded is None). For the frame last returned by next(),
+    `depay_time` is the cap's depayloader timestamp (GstCapture, else None) and `detect_time` the
+    time.perf_counter() at which its worker finished decode_fn (None when nothing was decoded).
+
+    With pool="process", decode_fn must be a module-level function and each frame is pickled to
+    the worker; pool="thread" shares the frame (cv2 and zbar release the GIL while decoding).
+    initializer runs once in each worker (e.g. common.placement CPU pinning).
+
+    A failed read is not queued: the grab thread backs off retry_delay seconds and tries again. After
+    stream_timeout seconds of failed reads in a row (0 = never) it signals the end of the stream:
+    `ended` is set and next() returns ret=False without blocking from then on.
+    """
+
+    def __init__(self, cap, decode_fn, workers=2, pool="thread", max_in_flight=8, initializer=None,
+                 retry_delay=0.01, stream_timeout=30.0):
+        if pool not in POOLS:
+            raise ValueError(f"Unknown decoder pool '{pool}' (expected one of {POOLS})")
+        self.cap = cap
+        self.decode_fn = decode_fn
+        self.executor = (ThreadPoolExecutor if pool == "thread" else ProcessPoolExecutor)(max_workers=workers, initializer=initializer)
+        self.in_flight = queue.Queue(maxsize=max_in_flight)
+        self.retry_delay = retry_delay
+        self.stream_timeout = stream_timeout
+        self.failed_reads = 0                       # failed reads in a row
+        self.ended = False                          # end of stream signalled by the grab thread
+        self.running = False
+        self.thread = None
+        self.depay_time = self.detect_time = None    # of the last frame returned by next()
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self._grab, name="frame-grabber", daemon=True)
+        self.thread.start()
+        return self
+
+    def _grab(self):
+        first_failure = None
+        while self.running:
+            ret, frame = self.cap.read()
+            if not ret:
+                self.failed_reads += 1
+                now = time.perf_counter()
+                first_failure = first_failure or now
+                if self.stream_timeout and now - first_failure >= self.stream_timeout:
+                    self.ended = True       # set before the marker: next() never blocks after it
+                    self.in_flight.put((False, None, None, None, None, None))
+                    break
+                time.sleep(self.retry_delay)
+                continue
+            self.failed_reads, first_failure = 0, None
+            frm_rcv = getattr(self.cap, "receive_time", None) or time.perf_counter()  # GstCapture: taken in its callback
+            metadata = getattr(self.cap, "metadata", None)
+            depay_time = getattr(self.cap, "depay_time", None)
+            try:
+                future = self.executor.submit(_timed, self.decode_fn, frame) if self.decode_fn else None
+            except RuntimeError:  # pool shut down by stop()
+                break
+            self.in_flight.put((ret, frame, frm_rcv, depay_time, metadata, future))  # blocks when max_in_flight frames wait
+
+    def next(self):
+        """Returns (ret, frame, receive_time, metadata, decoded) of the next frame in arrival order (ret=False: end of stream)."""
+        if self.ended and self.in_flight.empty():
+            return False, None, None, None, None
+        ret, frame, frm_rcv, self.depay_time, metadata, future = self.in_flight.get()
+        decoded, self.detect_time = future.result() if future else (None, None)
+        return ret, frame, frm_rcv, metadata, decoded
+
+    def stop(self):
+        self.running = False
+        self.executor.shutdown(wait=False, cancel_futures=True)
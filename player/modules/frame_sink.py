@@ -0,0 +1,139 @@
+'''
+# Date: 2026-10-18
+# Lab: LERIS/UFSCar
+# Project: CGReplay
+# Module: CG Player / Received Frame Sink
+# Background writer for the received frames (logs/received_frames): the receive loop only queues the
+# frame, worker threads encode and write it, so PNG/JPEG encoding no longer delays the commands.
+'''
+
+import cv2, os, queue, threading
+import numpy as np
+
+from common.log import get_logger
+
+FORMATS = ("png", "jpeg", "npy", "none")
+DROP_POLICIES = ("newest", "oldest", "block")
+
+
+class FrameSink:
+    """Bounded queue + worker threads writing the received frames.
+
+    format="png"  : <directory>/<frame_id:04d>.png with the given PNG compression level (0-9, 1 = fast)
+    format="jpeg" : <directory>/<frame_id:04d>.jpg with the given JPEG quality
+    format="npy"  : raw ring file <directory>/frames.npy (ring_size x H x W x 3, memory-mapped), frame n
+                    in slot n % ring_size, and the frame ID of each slot in <directory>/frame_ids.npy (-1 = empty)
+    format="none" : frames are discarded (counted as written)
+
+    When the queue is full (the disk falls behind) drop_policy decides: "newest" discards the frame
+    being submitted, "oldest" discards the oldest queued frame, "block" waits (the original
+    synchronous behaviour, bounded by queue_size). Dropped frames are counted in `dropped`, frames
+    that could not be written (cv2.imwrite failure, full disk, bad path) in `failed` and logged.
+    The frames are not copied: the caller must not modify a frame after submit().
+    """
+
+    def __init__(self, directory, format="png", png_compression=1, jpeg_quality=90, ring_size=600,
+                 workers=2, queue_size=32, drop_policy="newest"):
+        if format not in FORMATS:
+            raise ValueError(f"Unknown frame sink format '{format}' (expected one of {FORMATS})")
+        if drop_policy not in DROP_POLICIES:
+            raise ValueError(f"Unknown frame sink drop policy '{drop_policy}' (expected one of {DROP_POLICIES})")
+        self.directory = directory
+        self.format = format
+        self.drop_policy = drop_policy
+        self.ring_size = ring_size
+        if format == "png":
+            self.params = [cv2.IMWRITE_PNG_COMPRESSION, png_compression]
+        elif format == "jpeg":
+            self.params = [cv2.IMWRITE_JPEG_QUALITY, jpeg_quality]
+        os.makedirs(directory, exist_ok=True)
+
+        self.ring = self.ring_ids = None    # npy ring, created on the first frame (shape known)
+        self.ring_lock = threading.Lock()
+        self.slot = 0
+        self.queue = queue.Queue(maxsize=queue_size)
+        self.submitted = self.written = self.dropped = self.failed = 0
+        self.count_lock = threading.Lock()
+        self.log = get_logger("player.frame_sink")
+        self.threads = [threading.Thread(target=self._run, name=f"frame-sink-{i}", daemon=True) for i in range(workers)]
+        for thread in self.threads:
+            thread.start()
+
+    def submit(self, frame_id, frame):
+        """Queues a frame for writing; returns False if it (or an older frame) was dropped."""
+        self.submitted += 1
+        item = (frame_id, frame)
+        if self.drop_policy == "block":
+            self.queue.put(item)
+            return True
+        try:
+            self.queue.put_nowait(item)
+            return True
+        except queue.Full:
+            pass
+        self._count_drop()
+        if self.drop_policy == "oldest":
+            try:
+                self.queue.get_nowait()
+                self.queue.task_done()
+            except queue.Empty:
+                pass
+            try:
+                self.queue.put_nowait(item)
+            except queue.Full:
+                self._count_drop()    # the workers did not free a slot in between
+        return False
+
+    def _count_drop(self):
+        with self.count_lock:
+            self.dropped += 1
+
+    def _run(self):
+        while True:
+            item = self.queue.get()
+            if item is None:
+                self.queue.task_done()
+                break
+            frame_id, frame = item
+            try:
+                self._write(frame_id, frame)
+                with self.count_lock:
+                    self.written += 1
+            except (OSError, cv2.error, ValueError) as e:
+                with self.count_lock:
+                    self.failed += 1
+                self.log.warning("Could not write received frame %s: %s", frame_id, e)
+            self.queue.task_done()
+
+    def _write(self, frame_id, frame):
+        if self.format in ("png", "jpeg"):
+            path = os.path.join(self.directory, f"{frame_id:04d}.{'png' if self.format == 'png' else 'jpg'}")
+            if not cv2.imwrite(path, frame, self.params): # returns False instead of raising (full disk, bad path)
+                raise OSError(f"cv2.imwrite failed for {path}")
+        elif self.format == "npy":
+            with self.ring_lock:
+                if self.ring is None:
+                    self.ring = np.lib.format.open_memmap(os.path.join(self.directory, "frames.npy"), mode="w+",
+                                                          dtype=np.uint8, shape=(self.ring_size,) + frame.shape)
+                    self.ring_ids = np.lib.format.open_memmap(os.path.join(self.directory, "frame_ids.npy"), mode="w+",
+                                                              dtype=np.int64, shape=(self.ring_size,))
+                    self.ring_ids[:] = -1
+                slot = self.slot % self.ring_size
+                self.slot += 1
+                self.ring_ids[slot] = -1        # slot being rewritten
+            self.ring[slot] = frame
+            self.ring_ids[slot] = frame_id
+
+    def close(self):
+        """Writes the queued frames, stops the workers and flushes the ring file."""
+        for _ in self.threads:
+            self.queue.put(None)
+        for thread in self.threads:
+            thread.join()
+        if self.ring is not None:
+            self.ring.flush()
+            self.ring_ids.flush()
+
+    def stats(self):
+        """Returns (submitted, written, dropped, failed)."""
+        return self.submitted, self.written, self.dropped, self.failed
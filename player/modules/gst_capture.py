@@ -0,0 +1,134 @@
+'''
+# Date: 2026-10-18
+# Lab: LERIS/UFSCar
+# Project: CGReplay
+# Module: CG Player / GStreamer Capture
+# Native GStreamer receiver (appsink "new-sample" callback, mapped buffers) replacing cv2.VideoCapture:
+# frames are timestamped when GStreamer hands them over and keep their buffer PTS. It also timestamps
+# each frame when it leaves the depayloader (before decoding) and reads the frame metadata carried in
+# the RTP header extension (common/rtp_metadata.py) on the depayloader side.
+'''
+
+import gi
+gi.require_version('Gst', '1.0')
+from gi.repository import Gst
+import numpy as np
+import queue, time
+from collections import OrderedDict
+
+from common.rtp_metadata import check_ext_id, read_header_extension, unpack_metadata
+
+Gst.init(None)
+
+RTP_HEADER_PEEK = 128   # bytes of each RTP packet read by the depayloader probe (header + extension)
+
+
+class GstCapture:
+    """cv2.VideoCapture-like receiver: read() -> (ret, BGR frame), release().
+
+    The appsink (name=sink, or the first appsink of the pipeline) is forced to BGR and emits
+    "new-sample": the callback maps the buffer, copies the frame once into a numpy array, takes its
+    receive timestamp (time.perf_counter()) and queues it. read() returns the queued frames in order
+    and exposes, for the frame it returned, `receive_time`, `depay_time`, `pts` (ns) and `metadata`.
+
+    max_buffers bounds both the appsink queue and the frames waiting for read(); when full, drop=True
+    discards the oldest frame (counted in `dropped`), drop=False blocks the streaming thread.
+
+    A probe on the src pad of the depayloader (name=depay) timestamps each access unit pushed downstream
+    by its PTS, which the decoder keeps: `depay_time` is when the frame was reassembled from its RTP
+    packets, before decoding (None without a named depayloader, e.g. SCReAM pipelines).
+    RTP metadata (ext_id set): a probe on the depayloader sink pad reads the metadata of the incoming
+    RTP packets, paired with the access unit PTS the same way (None if the frame carried none).
+    """
+
+    def __init__(self, pipeline_str, ext_id=None, max_buffers=4, drop=False, depay_name="depay",
+                 sink_name="sink", timeout=1.0, history=64):
+        self.ext_id = check_ext_id(ext_id) if ext_id else None
+        self.timeout = timeout
+        self.drop = drop
+        self.history = history
+        self.current = None             # metadata of the RTP packets being depayloaded
+        self.by_pts = OrderedDict()     # access unit PTS -> (depay_time, FrameMetadata)
+        self.frames = queue.Queue(maxsize=max_buffers)   # (frame, receive_time, depay_time, pts, metadata)
+        self.received = self.dropped = 0
+        self.receive_time = self.depay_time = self.pts = self.metadata = None  # of the last frame returned by read()
+
+        self.pipeline = Gst.parse_launch(pipeline_str)
+        self.sink = self.pipeline.get_by_name(sink_name) or self._find_appsink()
+        self.sink.set_property("caps", Gst.Caps.from_string("video/x-raw,format=BGR"))
+        self.sink.set_property("emit-signals", True)
+        self.sink.set_property("sync", False)
+        self.sink.set_property("max-buffers", max_buffers)
+        self.sink.set_property("drop", drop)
+        self.sink.connect("new-sample", self._on_sample)
+        depay = self.pipeline.get_by_name(depay_name)
+        if depay:
+            depay.get_static_pad("src").add_probe(Gst.PadProbeType.BUFFER, self._on_access_unit)
+        if self.ext_id:
+            depay.get_static_pad("sink").add_probe(Gst.PadProbeType.BUFFER, self._on_packet)
+        self.opened = self.pipeline.set_state(Gst.State.PLAYING) != Gst.StateChangeReturn.FAILURE
+
+    def _find_appsink(self):
+        for element in self.pipeline.iterate_elements():
+            if element.get_factory().get_name() == "appsink":
+                return element
+        raise ValueError("No appsink in the receiver pipeline")
+
+    def isOpened(self):
+        return self.opened
+
+    def _on_packet(self, pad, info):
+        buffer = info.get_buffer()
+        metadata = unpack_metadata(read_header_extension(buffer.extract_dup(0, min(buffer.get_size(), RTP_HEADER_PEEK))), self.ext_id)
+        if metadata is not None:
+            self.current = metadata
+        return Gst.PadProbeReturn.OK
+
+    def _on_access_unit(self, pad, info):
+        self.by_pts[info.get_buffer().pts] = (time.perf_counter(), self.current)
+        while len(self.by_pts) > self.history:
+            self.by_pts.popitem(last=False)
+        return Gst.PadProbeReturn.OK
+
+    def _on_sample(self, sink):
+        sample = sink.emit("pull-sample")
+        receive_time = time.perf_counter()
+        buffer = sample.get_buffer()
+        caps = sample.get_caps().get_structure(0)
+        width, height = caps.get_value("width"), caps.get_value("height")
+        ok, info = buffer.map(Gst.MapFlags.READ)
+        if not ok:
+            return Gst.FlowReturn.OK
+        try:
+            # Rows may be padded (stride), so reshape by row and keep width * 3 bytes of each
+            frame = np.frombuffer(info.data, dtype=np.uint8).reshape(height, -1)[:, :width * 3].reshape(height, width, 3).copy()
+        finally:
+            buffer.unmap(info)
+
+        depay_time, metadata = self.by_pts.pop(buffer.pts, (None, None))
+        item = (frame, receive_time, depay_time, buffer.pts, metadata)
+        self.received += 1
+        if self.drop:
+            while True:
+                try:
+                    self.frames.put_nowait(item)
+                    break
+                except queue.Full:
+                    try:
+                        self.frames.get_nowait()  # discard the oldest frame
+                        self.dropped += 1
+                    except queue.Empty:
+                        pass
+        else:
+            self.frames.put(item)
+        return Gst.FlowReturn.OK
+
+    def read(self):
+        try:
+            frame, self.receive_time, self.depay_time, self.pts, self.metadata = self.frames.get(timeout=self.timeout)
+        except queue.Empty:
+            return False, None
+        return True, frame
+
+    def release(self):
+        self.pipeline.set_state(Gst.State.NULL)
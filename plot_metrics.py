@@ -7,6 +7,9 @@ import sys
 import argparse
 import numpy as np
 
+sys.path.append(os.path.dirname(os.path.abspath(__file__)))  # CGReplay root (common modules)
+from common.metrics_store import has_store, load_metrics
+
 # Create folder if it does not exist
 output_dir = "visualizations"
 os.makedirs(output_dir, exist_ok=True)
@@ -130,16 +133,19 @@ def get_data_and_suffix():
         tuple: (DataFrame, suffix_string)
     """
     parser = argparse.ArgumentParser(description='Plot cloud gaming metrics')
-    parser.add_argument('--file', '-f', type=str, help='Path to CSV file containing log data')
+    parser.add_argument('--file', '-f', type=str, help='Path to CSV file containing log data (its <log>.cols columnar store is used when present)')
     args = parser.parse_args()
     
     if args.file:
         try:
-            if not os.path.exists(args.file):
+            if has_store(args.file):
+                # Typed columnar log (<log>.cols): no header sniffing or text parsing
+                df = load_metrics(args.file)
+            elif not os.path.exists(args.file):
                 print(f"Error: File '{args.file}' not found. Using mock data instead.")
                 return get_mock_data(), "_mock"
-            
-            df = detect_and_load_csv(args.file)
+            else:
+                df = detect_and_load_csv(args.file)
             print(f"Successfully loaded data from: {args.file}")
             print(f"Original columns: {list(df.columns)}")
             print(f"Data shape: {df.shape}")
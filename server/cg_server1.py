@@ -5,11 +5,31 @@
 # This is Configured for Netsoft 2025 Conference!
 '''
 
-import os , sys, time, socket, select, subprocess, cv2, qrcode, gi, hashlib, yaml 
-import numpy as np, pandas as pd
+import os , sys, time, socket, select, subprocess, cv2, gi, hashlib, yaml 
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")) # CGReplay root (common modules)
+from common.sync_table import SyncTable
+from common.wire import decode_message
+from common.frame_tags import make_frame_tag
+from common.buffered_log import BufferedLog
+from common.metrics_store import SCHEMAS
+from common.log import PeriodicSummary, get_logger, setup_logging
+from common.placement import Placement
+from modules.frame_store import open_frame_source
+from modules.overlay import OverlayEngine
+from modules.pacing import FramePacer
+from modules.control_plane import ControlReceiver, SessionRouter
+from modules.rtp_metadata_sender import RtpMetadataSender
+from modules.bitrate_control import EncoderBitrate
+from modules.rate_control import RateSignal, make_rate_policy
+from modules.recovery import FrameRing, NackRecovery
+from modules.sessions import load_sessions, run_sessions, session_log_path
+from modules.encoder_profiles import load_encoder_profile
+from modules.frame_probes import FrameProbes
+from modules.frame_buffers import FrameBuffers
+from common.rtp_metadata import FrameMetadata
 
-
-os.sched_setaffinity(0, {0})
 gi.require_version('Gst', '1.0')
 
 from gi.repository import Gst
@@ -20,6 +40,13 @@ Gst.init(None)
 with open("../config/config.yaml", "r") as file:
     config = yaml.safe_load(file)
 
+# Replay sessions: one per player (sessions section), or the single gamer of the gamer section
+sessions = load_sessions(config)
+# CPU placement (placement.server): the control loop(s) here, the encoder threads and log writers when spawned
+placement = Placement("server", config["placement"]["server"])
+placement.pin("control_loop")
+run_metadata = config["placement"]["run_metadata"]
+
 # Load settings from YAML file
 # Loading Running Setup ****************************************************************************************
 stop_frm_number = config["Running"]["stop_frm_number"]
@@ -33,39 +60,31 @@ rate_control_log = config["server"]["log_rate_control"]     # Logging the Encodi
 server_log = config["server"]["log_server"]                 # Logging the Rate, FPS, CMD Rate .. Main Log
 # frame_id,received_fame_id,my_gap,received_time,send_time,current_srv_fps,received_fps,current_cps,received_cps,current_srv_fps/received_fps,received_cps/current_cps,bitrate
 frame_log = config["server"]["log_frame"]                   # Logging Frame ID, current_srv_fps, processing_time, bitrate 
+overlay_log = config["server"]["log_overlay"]               # Logging the out-of-band QR fields (compact payload)
+pacing_log = config["server"]["log_pacing"]                 # Logging the frame pacing deadlines and jitter
+bitrate_log = config["server"]["log_bitrate"]               # Logging the target, applied and encoded bitrate
+encode_log = config["server"]["log_encode"]                 # Logging the encode latency of each frame
+stages_log = config["server"]["log_stages"]                 # Logging the stage timestamps of each frame (latency waterfall)
 
 '''
-Referesh Logs
+Referesh Logs (one buffered writer per log, flushed in the background)
 '''
-# Remove rate_Control log
-if os.path.exists(rate_control_log):
-    os.remove(rate_control_log)
-
-with open(rate_control_log, "w") as f:
-    f.write("frame_id,rate_ctl\n")
-
-
-# Remove server log
-if os.path.exists(server_log):
-    os.remove(server_log)
-
-with open(server_log, "w") as f:
-    f.write("frame_id,received_fame_id,my_gap,received_time,send_time,current_srv_fps,received_fps,current_cps,received_cps,current_srv_fps/received_fps,received_cps/current_cps,bitrate\n")
-
-
-
-# Remove frame Log
-if os.path.exists(frame_log):
-    os.remove(frame_log)
-
-with open(frame_log, "w") as f:
-    f.write("frame_id,resolution,Frame Size(Byte),GOP,current_srv_fps,processing_time,bitrate\n")
-
+log_rows = config["logging"]["buffer_rows"]                 # Rows buffered per log before a background flush
+log_flush_interval = config["logging"]["flush_interval"]    # Seconds between background flushes
 
+log_formats = config["logging"]["formats"]                  # "csv" and/or "npz" (typed columnar chunks, common/metrics_store.py)
+log_chunk_rows = config["logging"]["chunk_rows"]            # Rows per compressed npz chunk
+log_options = (log_rows, log_flush_interval, log_formats, log_chunk_rows)
+setup_logging(config["logging"]["level"])                   # Console: DEBUG = per-frame/per-message lines, INFO = summaries
+log_summary_interval = config["logging"]["summary_interval"] # Seconds between console summary lines (0 = off)
+log = get_logger("server")
+# The logs of each session are opened by stream_frames() (suffixed _s<session_id> with several sessions)
 
 
 # All frames with Bitrate
 cg_server_socket_timeout = config["server"]["socket_timeout"]
+control_rcvbuf = config["server"]["control_rcvbuf"]         # Kernel receive buffer of the control socket (bytes)
+control_batch = config["server"]["control_batch"]           # Datagrams drained per wake-up of the control receiver
 
 # Loading CG Gamer or Player Setup****************************************************************************** 
 player_ip = config['gamer']["player_IP"]                     # CG Gamer IP address
@@ -76,6 +95,8 @@ my_command_port = config['gamer']["palyer_command_port"]     # UDP Port for rece
 # Loading CG Server Sync file and Frames ***********************************************************************
 folder_path = config[game_name]["frames"]                     # The folder includes the frames in png format!
 my_command_frame_addr = config[game_name]["sync_file"]        # The sync file for scynching between frames and commands!
+frame_store_prefix = config[game_name].get("frame_store")     # The pre-decoded frames (server/prepare_frames.py)
+use_frame_store = config["server"].get("use_frame_store", False)
 
 # Loading Encoding Setup ***************************************************************************************
 fps = config["encoding"]["fps"]                                 # Frame Rate (fps)
@@ -84,11 +105,29 @@ resolution_height = config["encoding"]["resolution"]["height"]  # Height
 GOP = config["encoding"]["GOP"]
 MyvideoEncoder = config["encoding"]["name"] # Encoder name e.g., H.264/H.265 
 myencoder = config["encoding"][MyvideoEncoder]["encoder"]
+encoder_profile = load_encoder_profile(config["encoding"], myencoder) # Encoder properties (encoding.profile)
 myparser = config["encoding"][MyvideoEncoder]["parsing"]
 myrtp = config["encoding"][MyvideoEncoder]["packetization"]
+pacing_enabled = config["encoding"]["pacing"]["enabled"]         # Deadline-based pacing at 'fps'
+pacing_late_policy = config["encoding"]["pacing"]["late_policy"] # "catchup" or "drop"
+pacing_max_late = config["encoding"]["pacing"]["max_late_frames"]
+bitrate_control = config["encoding"]["bitrate_control"]["enabled"]  # Live encoder bitrate (set_property); non-SCReAM only
+bitrate_min_interval = config["encoding"]["bitrate_control"]["min_interval"]   # Seconds between encoder updates
+bitrate_min_change = config["encoding"]["bitrate_control"]["min_change"]       # Relative change needed for an update
+bitrate_window = config["encoding"]["bitrate_control"]["window"]               # Seconds of encoded output per measure
+# Loading Overlay Setup ****************************************************************************************
+qr_size = config["overlay"]["qr_size"]                          # QR code size in pixels
+qr_padding = config["overlay"]["padding"]                       # Padding from the bottom-right corner
+qr_payload = config["overlay"]["payload"]                       # "full" or "compact" (cached QR tiles)
+qr_cache_size = config["overlay"]["cache_size"]
+frame_tag_name = config["overlay"]["tag"]                       # Frame ID tag: "qr" or "strip" (block pattern)
+strip_block = config["overlay"]["strip_block"]                  # Strip cell size in pixels (macroblock aligned)
 # Loading Protocols Setup **************************************************************************************
 scream_state=config["protocols"]["SCReAM"]                      # CCA Protocol for UDP as SCReAM developed by Ericsson!
 scream_sender=config["protocols"]["sender"]                     # Sender as CGServer!
+rtp_metadata = config["protocols"]["rtp_metadata"]["enabled"] and not scream_state # Frame metadata in an RTP header extension
+rtp_metadata_ext_id = config["protocols"]["rtp_metadata"]["ext_id"]
+rtp_metadata_validate = config["protocols"]["rtp_metadata"]["validate"] # Keep the frame tag in the pixels as well
 
 
 # Loading Sync Setup *******************************************************************************************
@@ -96,6 +135,13 @@ Enc_Rate_jump = config["sync"]["jump"]                          # CGReplay Encod
 Enc_Rate_rise = config["sync"]["rise"]                          # CGReplay Encoding Frame Rate rise!
 Enc_Rate_decrese = config["sync"]["decrese"]                    # CGReplay Encoding Frame Rate decrease!
 Enc_Rate_fall = config["sync"]["fall"]                          # CGReplay Encoding Frame Rate fall!
+rate_policy_name = config["rate_control"]["policy"]             # "sliding_window" / "aimd" / "delay_gradient" / "hold"
+# Loading Nack Recovery Setup **********************************************************************************
+recovery_policy = config["recovery"]["policy"]                  # "rewind" (resend from the ring) or "skip"
+recovery_ring_size = config["recovery"]["ring_size"]            # Frames kept for resending
+recovery_rewind_frames = config["recovery"]["rewind_frames"]    # Max frames resent per Nack
+recovery_min_interval = config["recovery"]["min_interval"]      # Seconds: Nacks within it belong to the same loss
+recovery_force_idr = config["recovery"]["force_idr"]            # Force an IDR frame on each recovery
 
 
 import struct
@@ -149,49 +195,15 @@ def hash_string(input_string, output_size):
     # Return the hex digest with the specified byte size
     return shake.hexdigest(output_size)
 
-# Custom function to load autocommands.txt while handling the complex 'command' field
-def load_syncfile(file_path):
-    synccommand = []
-    with open(file_path, 'r') as file:
-        next(file)  # Skip the header line
-        for line in file:
-            # Split only on the last comma to avoid splitting inside the 'command' field
-            parts = line.rsplit(',', 1)
-            if len(parts) == 2:
-                id_and_command, encrypted_cmd = parts
-                # Split the ID from the command part
-                id_str, command_str = id_and_command.split(',', 1)
-                synccommand.append((int(id_str), command_str, encrypted_cmd.strip()))
-    return pd.DataFrame(synccommand, columns=['ID', 'command', 'encrypted_cmd'])
-
 # List of frame IDs where we want to pause and wait for socket input
-sync_df = load_syncfile(my_command_frame_addr) # Load autocommands for fram/command ordering
-pause_frame_ids = sync_df['ID'].tolist()
+sync_table = SyncTable.load(my_command_frame_addr) # Load autocommands for fram/command ordering (frame ID -> commands index)
+pause_frame_ids = sync_table.ids
 # Backup for Forza
 resolution = (resolution_width,resolution_height)
 
-def generate_qr_code(data):
-    """Generate QR code as an image from the given data."""
-    qr = qrcode.QRCode(
-        version=1,
-        error_correction=qrcode.constants.ERROR_CORRECT_L,
-        box_size= 20, #10,
-        border=4,
-    )
-    qr.add_data(data)
-    qr.make(fit=True)
-
-    # Create an image from the QR Code instance
-    qr_img = qr.make_image(fill='black', back_color='white')
-    
-    # Convert to numpy array for OpenCV compatibility
-    qr_img = np.array(qr_img.convert('RGB'))
-    
-    return qr_img
-
 # Setup Socket for Receiving the Commands
 def setup_socket():
-    """Set up a UDP socket to send control messages."""
+    """Set up the UDP socket receiving the control messages of every session."""
     sock = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
     # Allow reuse of the same address and port
     #sock.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEADDR, 1)
@@ -199,14 +211,29 @@ def setup_socket():
 
     # Bind the socket to the specific source port (same as GStreamer)
     sock.bind((cg_server_ipadress, my_command_port)) # cg_server_port))  # It can be  the same Streaming or differnt!
-    print(f"Listening on UDP port {cg_server_port} for streaming & {my_command_port} for control (Joystick) data...")
+    print(f"Listening on UDP port {my_command_port} for control (Joystick) data of {len(sessions)} session(s)...")
     return sock
 
 # Stream the video frames
 received_fame_id = 0
 
-def stream_frames(game_name):
-    global bitrate
+def stream_frames(session, control_queues, frame_source, overlay):
+    """Streams the replay of one session (its own pipeline, sync cursor, rate controller and logs)."""
+    log = get_logger(f"server.{session.name}" if session.name else "server")
+    control = control_queues[session.name]     # control messages of this session (SessionRouter)
+    player_ip, player_port, stream_port = session.player_ip, session.player_port, session.stream_port
+    tag = f"[{session.name}] " if session.name else "" # prefix of the session's console lines
+
+    with placement.spawning("writers"): # log flusher threads
+        rate_control_logger = BufferedLog(session_log_path(rate_control_log, session), SCHEMAS["server_rate_control"], *log_options)
+        server_logger = BufferedLog(session_log_path(server_log, session), SCHEMAS["server_qoe"], *log_options)
+        frame_logger = BufferedLog(session_log_path(frame_log, session), SCHEMAS["server_frame"], *log_options)
+        overlay_logger = BufferedLog(session_log_path(overlay_log, session), SCHEMAS["server_overlay"], *log_options)
+        pacing_logger = BufferedLog(session_log_path(pacing_log, session), SCHEMAS["server_pacing"], *log_options)
+        bitrate_logger = BufferedLog(session_log_path(bitrate_log, session), SCHEMAS["server_bitrate"], *log_options)
+        encode_logger = BufferedLog(session_log_path(encode_log, session), SCHEMAS["server_encode"], *log_options)
+        stages_logger = BufferedLog(session_log_path(stages_log, session), SCHEMAS["server_stages"], *log_options)
+
     # setup Encoding H.264
     bitrate = config["encoding"]["starting_bitrate"]
     bitrate_min = config["encoding"]["bitrate_min"] # 2000
@@ -215,15 +242,25 @@ def stream_frames(game_name):
     # setup Synchronization sliding window min & max
     window_min = config["sync"]["window_min"] # 1 
     window_max = config["sync"]["window_max"] # 4
+
+    # Rate control policy: sliding_window (sync section) / aimd / delay_gradient / hold (SCReAM adapts the rate itself)
+    if scream_state:
+        rate_policy = make_rate_policy("hold", bitrate, bitrate_min, bitrate_max)
+    elif rate_policy_name == "sliding_window":
+        rate_policy = make_rate_policy(rate_policy_name, bitrate, bitrate_min, bitrate_max, window_min=window_min,
+                                       window_max=window_max, jump=Enc_Rate_jump, rise=Enc_Rate_rise,
+                                       decrease=Enc_Rate_decrese, fall=Enc_Rate_fall)
+    else:
+        rate_policy = make_rate_policy(rate_policy_name, bitrate, bitrate_min, bitrate_max,
+                                       **config["rate_control"].get(rate_policy_name, {}))
+    bitrate = rate_policy.bitrate
+    print(f"{tag}Rate control policy: {rate_policy.name} | streaming to {player_ip}:{player_port} from port {stream_port}")
  
 
     cmd_previous_time =  time.perf_counter()
     
     # bitrate = 10000  # in kbps
     """Stream frames with QR code embedded over UDP using GStreamer."""
-    # Set up the control socket
-    control_socket = setup_socket()
-    #control_socket.settimeout(1)
 
     if scream_state == False:
         ''' The main which worked!'''
@@ -239,12 +276,16 @@ def stream_frames(game_name):
         """
         '''
 
+        # With pacing, each buffer carries its own PTS/duration instead of the appsrc arrival time
+        do_timestamp = "false" if pacing_enabled else "true"
+        # With RTP metadata, the RTP packets are tagged and sent by RtpMetadataSender instead of udpsink
+        rtp_sink = "appsink name=rtpsink" if rtp_metadata else f"udpsink host={player_ip} port={player_port} bind-port={stream_port}"
         pipeline_str = f"""
-            appsrc name=source is-live=true block=true format=GST_FORMAT_TIME do-timestamp=true !
+            appsrc name=source is-live=true block=true format=GST_FORMAT_TIME do-timestamp={do_timestamp} !
             videoconvert ! video/x-raw,format=I420,width={resolution_width},height={resolution_height},framerate={fps}/1 !
-            {myencoder} bitrate={bitrate} speed-preset=ultrafast tune=zerolatency key-int-max={GOP} !
-            {myparser} ! {myrtp} ! 
-            udpsink host={player_ip} port={player_port} bind-port={cg_server_port}
+            {myencoder} name=encoder !
+            {myparser} ! {myrtp} name=pay ! 
+            {rtp_sink}
         """
         
         # frame_size_bytes ≈ (bitrate_kbps * 1000) / 8 / fps
@@ -252,6 +293,9 @@ def stream_frames(game_name):
         pipeline = Gst.parse_launch(pipeline_str)
         #print(pipeline)
         appsrc = pipeline.get_by_name("source")
+        # Encoder profile properties (validated) + starting bitrate & GOP
+        encoder_profile.apply(pipeline.get_by_name("encoder"), bitrate, GOP)
+        print(f"{tag}Encoder profile: {encoder_profile.describe()}")
     else:
         print(f"It's value is  {scream_state}-SCReAM Enabled")
         # SCReAM
@@ -297,111 +341,158 @@ def stream_frames(game_name):
     # Set the caps for the 'appsrc' element, including FPS and resolution
     appsrc.set_property("caps", Gst.Caps.from_string(f"video/x-raw,format=BGR,width={resolution_width},height={resolution_height},framerate={fps}/1"))
 
-    # Start the pipeline
-    pipeline.set_state(Gst.State.PLAYING)
+    # RTP header extension metadata: the payloader output is tagged and sent from the streaming port
+    rtp_sender = None
+    if rtp_metadata:
+        rtp_socket = socket.socket(socket.AF_INET, socket.SOCK_DGRAM)
+        rtp_socket.setsockopt(socket.SOL_SOCKET, socket.SO_REUSEPORT, 1)
+        rtp_socket.bind((cg_server_ipadress, stream_port))
+        rtp_sender = RtpMetadataSender(pipeline, appsrc, rtp_socket, (player_ip, player_port), rtp_metadata_ext_id)
+
+    # Live encoder bitrate: the rate controller's bitrate is applied to the encoder element (SCReAM adapts its own)
+    encoder_rate = None
+    if bitrate_control and not scream_state:
+        encoder_rate = EncoderBitrate(pipeline, bitrate, bitrate_min, bitrate_max, "encoder",
+                                      bitrate_min_interval, bitrate_min_change, bitrate_window, encoder_profile.info.bitrate_scale)
+        bitrate = encoder_rate.target
+
+    # Nack recovery: ring of the last frame indices pushed + rewind/skip + forced IDR (the encoder is named in non-SCReAM pipelines)
+    encoder = pipeline.get_by_name("encoder") if recovery_force_idr else None
+    recovery = NackRecovery(FrameRing(recovery_ring_size), recovery_policy, recovery_rewind_frames,
+                            recovery_min_interval, encoder)
+
+    # Per-frame probes (appsrc -> encoder -> payloader, matched by PTS), logged from the streaming thread
+    frame_probes = None
+    if not scream_state:
+        def log_encoded_frame(record):
+            convert_ms, encode_ms, packetize_ms = FrameProbes.stages(record)
+            frame_type = None if record.keyframe is None else ("IDR" if record.keyframe else "P")
+            encode_logger.log(record.frame_id, record.pts, encoder_profile.name, frame_type, record.size, record.packets,
+                              record.rtp_bytes, convert_ms, encode_ms, packetize_ms)
+            stages_logger.log(record.frame_id, record.pts, record.captured, record.pushed, record.encode_start,
+                              record.encode_end, record.sent)
+        frame_probes = FrameProbes(appsrc, pipeline.get_by_name("encoder"), pipeline.get_by_name("pay"), log_encoded_frame)
+
+    # Start the pipeline (its streaming threads and the encoder's own threads inherit the encoder CPUs)
+    with placement.spawning("encoder"):
+        pipeline.set_state(Gst.State.PLAYING)
     
     #frame_id = 1  # Frame counter (starting from 1 for human-readable frame IDs)
-    png_files = sorted([f for f in os.listdir(folder_path) if f.endswith(".png")])  # List PNG files
+    # Frame buffers: each frame is copied from the (read-only) store into the Gst buffer pushed to appsrc, and stamped there
+    frame_buffers = FrameBuffers(appsrc.get_property("caps"), resolution_width, resolution_height)
+    # Frame pacing: one deadline per frame on the monotonic clock
+    pacer = FramePacer(fps, pacing_late_policy, pacing_max_late) if pacing_enabled else None
+    # PTS of the first frame = current running time of the (live) pipeline
+    clock = pipeline.get_clock()
+    pts_base = clock.get_time() - pipeline.get_base_time() if (pacer and clock) else 0
+
+    def load_frame(frame):
+        """Loads the current frame at the desired resolution into `frame` and stamps its tag; False if it could not be read."""
+        # memcpy from the store, or imread + resize
+        if frame_source.load(idx, frame) is None:
+            return False
+        # Overlay the QR code onto the bottom-right corner of the frame (cached tile blit)
+        if not rtp_metadata or rtp_metadata_validate: # RTP metadata only: zero pixels spent on the frame ID
+            overlay.apply(frame, frame_id, timestamp, bitrate)
+            if qr_payload == "compact": # rcv_timestamp & bitrate are carried out-of-band
+                overlay_logger.log(frame_id, timestamp, bitrate)
+        return True
+
+    def push_frame(gst_buffer):
+        """Pushes one frame to appsrc on its deadline (explicit PTS/duration); returns the frames to drop."""
+        dropped = 0
+        if rtp_sender:
+            rtp_sender.push(FrameMetadata(frame_id, timestamp, resolution_width, resolution_height, bitrate))
+        if frame_probes:
+            frame_probes.push(frame_id, timestamp)
+        if pacer:
+            dropped = pacer.wait()
+            gst_buffer.pts = pts_base + pacer.pts()
+            gst_buffer.duration = pacer.duration_ns
+            pacing_logger.log(frame_id, pacer.slot, gst_buffer.pts, pacer.lateness*1000, pacer.waited*1000, dropped)
+            pacer.advance()
+        appsrc.emit("push-buffer", gst_buffer)
+        return dropped
+
     # flag_lock = False
-    cmd_counter = 0  #sync_df.shape[0] # max number 
+    cmd_counter = 0  #len(sync_table) # max number 
     previous_time = time.perf_counter()
     
 
+    # Periodic console summary instead of per-frame lines (those are DEBUG)
+    summary = PeriodicSummary(log, ("fps", "gap", "bitrate", "encoded"), log_summary_interval)
+    last_gap = None # gap of the last control message
+
     idx = 0
-    while idx < len(png_files):
+    while idx < len(frame_source):
         #if idx == stop_frm_number: # stop after streaming 'stop_frm_number' frames! 
             #break
-        file = png_files[idx]  # Access the file by index
-        print("Log hint==>>>",file, idx)
+        frame_id = frame_source.frame_id(idx)  # Frame ID (the PNG file name)
+        log.debug("Log hint==>>> %s %s", frame_id, idx)
         
         # Note: Checkpoint
 
-        # Construct the full file path
-        frame_path = os.path.join(folder_path, file)
-
-        # Load the frame
-        frame = cv2.imread(frame_path)  # Read the image file
-        frame_id = int(file.split('.')[0])  # Extract frame ID from the filename
-        print("Debug:==>", frame_id)
-
         if frame_id == stop_frm_number+1: # stop after streaming 'stop_frm_number' frames! 
             break
 
-        if frame is None:
-            print(f"Could not load frame {file}")
+        timestamp = time.perf_counter()
+        if frame_id in recovery.ring: # resent after a Nack (or held): read again from the frame source
+            log.debug("Resending frame %s", frame_id)
+        # Load and stamp the frame in the memory of the buffer pushed to GStreamer (no tobytes() copy)
+        gst_buffer, loaded = frame_buffers.fill(load_frame)
+        if not loaded:
+            log.warning("Could not load frame %s", frame_id)
             idx += 1  # Move to the next file if loading fails
             continue    
-        
-        #idx= idx + 1
-
-
-        
-        timestamp = time.perf_counter()
-        # Resize frame to the desired resolution
-        #frame = cv2.resize(frame, resolution)
-        frame = cv2.resize(frame, resolution, interpolation=cv2.INTER_AREA)
-
-
-        qr_data = f"Frame ID: {frame_id}, rcv_timestamp: {timestamp}, resolution: {resolution},bitrate:{bitrate}"
-        qr_img = generate_qr_code(qr_data)
-        
-        qr_size = 200 #100  # QR code size in pixels
-        qr_img = cv2.resize(qr_img, (qr_size, qr_size))
-
-        # Overlay the QR code onto the bottom-right corner of the frame
-        x_offset = frame.shape[1] - qr_size - 10  # 10px padding from the right edge
-        y_offset = frame.shape[0] - qr_size - 10  # 10px padding from the bottom edge
-        frame[y_offset:y_offset + qr_size, x_offset:x_offset + qr_size] = qr_img
-
-        # Convert frame to bytes and push to GStreamer
-        frame_byte = frame.tobytes()
-        gst_buffer = Gst.Buffer.new_wrapped(frame_byte) #frame.tobytes())
+        recovery.ring.store(frame_id, idx)
          
         # Debug: Keep it in mind 
-        appsrc.emit("push-buffer", gst_buffer)
+        dropped = push_frame(gst_buffer)
+        waited = pacer.waited if pacer else 0
         # fpscomputing + processing time (Rendering)
         #############################################################################################################
         # Note: This code was added because the first frame was not being sent properly! 
         if frame_id==1:
             #gst_buffer = Gst.Buffer.new_wrapped(frame_byte) #frame.tobytes())
-            appsrc.emit("push-buffer", gst_buffer)
-            print('Sending the frame one again')
+            dropped += push_frame(gst_buffer.copy_deep()) # next slot, so the PTS stays monotonic (own buffer: the first one is queued)
+            waited += pacer.waited if pacer else 0
+            log.debug('Sending the frame one again')
         #############################################################################################################
 
         my_fps_time = time.perf_counter() 
         current_srv_fps = 1/(my_fps_time - previous_time)
-        processing_time = my_fps_time - timestamp
+        processing_time = my_fps_time - timestamp - waited # pacing sleep excluded
         previous_time = my_fps_time
 
         # Log the frame that is being streamed (frame_log.txt)
-        print(f"Streaming frame {frame_id}")
-        with open(frame_log, "a") as f: f.write(f"{frame_id},{resolution},{len(frame_byte)},{GOP},{current_srv_fps},{processing_time},{bitrate}\n")
+        log.debug("Streaming frame %s", frame_id)
+        frame_logger.log(frame_id, resolution, frame_buffers.size, GOP, current_srv_fps, processing_time, bitrate) # raw size; encoded size in srv_encode
         
-        # Socket Time out 
-        timeout = cg_server_socket_timeout ## socket timeout is set in config file!
-        #timeout = 0.0001 # if not flag_lock else None
-        ready_to_read, _, _ = select.select([control_socket], [], [], timeout) #0.01)  # 10 milliseconds timeout         
         received_fame_id = 0 
+        hold_frame = False # a command far behind the window holds the current frame (resent on the next iteration)
+        rewind_idx = None  # Nack recovery: index of the frame to resend from
 
-        if ready_to_read:
+        # Process every control message received since the last frame (arrival-timestamped by the receiver thread)
+        for received_time, data, addr in control.drain():
             #print('It is ready ready to receive!!!!!!')
-            # Receive control data for each matching command (blocking)
 
-            data, addr = control_socket.recvfrom(1024)
-            received_data = data.decode().split(',')
-            received_time = time.perf_counter() #time.time() * 1000  # Timestamp in milliseconds
+            try:
+                received_data = decode_message(data) # binary (zero-copy digests) or text (compatibility)
+            except (ValueError, KeyError, UnicodeDecodeError) as e:
+                log.warning("Dropped malformed control message from %s: %s", addr, e)
+                continue
             current_cps = 1/(received_time - cmd_previous_time)
             cmd_previous_time = received_time
 
-            send_time = received_data[0]
-            received_cmd = received_data[1]
-            received_fame_id = int(received_data[2])
-            received_type = received_data[3]
-            received_cmd_number = received_data[4]
-            received_fps = float(received_data[5])
-            received_cps =  float(received_data[6])
+            send_time = received_data.send_time
+            received_cmd = received_data.cmd
+            received_fame_id = received_data.frame_id
+            received_type = received_data.type
+            received_cmd_number = received_data.number
+            received_fps = received_data.fps
+            received_cps =  received_data.cps
             #print(received_type)
-            print(f"Received control data: Type ({received_type}) Time = {send_time}, from {addr}")
+            log.debug("Received control data: Type (%s) Time = %s, from %s", received_type, send_time, addr)
             #print(f"Debug: {received_cmd} | Number: {cmd_number}")
 
 
@@ -409,124 +500,98 @@ def stream_frames(game_name):
 
 
 
-            my_gap = max((frame_id - received_fame_id),0) # to check the window 
-            Nack_counter = 0
-            rate_ctl = [None , None, None, None]
+            # A Nack carries no frame ID (0): its gap is measured from the last acknowledged frame
+            reference_frame_id = recovery.last_acked if received_type=='Nack' else received_fame_id
+            my_gap = max((frame_id - reference_frame_id),0) # to check the window 
 
 
             """
             Logging the received data (srv_QoEMetrics) 
             """
-            with open(server_log, "a") as f: 
-                f.write(f"{frame_id},{received_fame_id},{my_gap},{received_time},{send_time},{current_srv_fps},{received_fps},{current_cps},{received_cps},{current_srv_fps/received_fps},{received_cps/current_cps},{bitrate} \n")
-                print("Total is logging!")
-
+            server_logger.log(frame_id, received_fame_id, my_gap, received_time, send_time, current_srv_fps, received_fps,
+                              current_cps, received_cps, current_srv_fps/received_fps, received_cps/current_cps, bitrate)
 
 
+            matched = True # command found in the sync table (Ack/Nack always count)
             if received_type=='Ack':
-                rate_ctl = [None , None, None, None]
-                rate_ctl[3] = 'Ack'
-                Nack_counter = 0 
-                if my_gap <= window_min:    # Check to keep sync using sliding between min/max window
-                    print(f'(Ack) [High Sync:(Fast Rate Increase)] ==> Frame ID is {frame_id} with Gap {my_gap} \n [player fps = {received_fps}] [server fps = {current_srv_fps}] \n [player cps = {received_cps} [server cps = {current_cps}]] | bitrate = {bitrate}')
-                    bitrate = bitrate + (bitrate * Enc_Rate_jump) if bitrate_min <= bitrate <= bitrate_max else bitrate
-                    #rate_ctl[0] = 'Fast Increase', rate_ctl[1] = 0.2, rate_ctl[2] = bitrate
-                    rate_ctl = ['Rate Jump', Enc_Rate_jump, bitrate,rate_ctl[3]]
-
-                elif window_min < my_gap <= window_max:
-                    print(f'(Ack) [Sync: (Rate Increase)] ==> Frame ID is {frame_id} with Gap {my_gap} \n [player fps = {received_fps}] [server fps = {current_srv_fps}] \n [player cps = {received_cps} [server cps = {current_cps}]] | bitrate = {bitrate}')
-                    bitrate = bitrate + (bitrate * Enc_Rate_rise) if bitrate_min <= bitrate <= bitrate_max else bitrate
-                    rate_ctl = ['Rate Rise', Enc_Rate_rise,bitrate,rate_ctl[3]]
-                    
-                elif my_gap > window_max:
-                    print(f'(Ack) [Critical Sync: (Rate Decrease)] ==> Frame ID is {frame_id} with Gap {my_gap} \n [player fps = {received_fps}] [server fps = {current_srv_fps}] \n [player cps = {received_cps} [server cps = {current_cps}]] | bitrate = {bitrate}')
-                    # print(f'(Ack) (**Wait**) ==> Received Frame is {received_fame_id} == current {frame_id} \n [fps = {received_fps}] [server fps = {current_srv_fps}] but Gap is {my_gap}')
-                    bitrate = bitrate - (bitrate * Enc_Rate_decrese) if bitrate_min <= bitrate <= bitrate_max else bitrate
-                    rate_ctl = ['Rate Decrease', Enc_Rate_decrese, bitrate,rate_ctl[3]]
-                    #idx = idx - my_gap
-
-                #with open(rate_control_log, "a") as f: f.write(f"{frame_id},{rate_ctl}\n")
+                recovery.on_ack(received_fame_id)
 
             elif received_type=='Nack':
-                rate_ctl = [None, None, None, None]
-                rate_ctl[3] = 'command'
-                if Nack_counter == 0:
-                    #print(f'(Nack) ==> Received Frame is {received_fame_id}')
-                    print(f'(Nack) [Not Sync: (Decrease & lagged!)] ==> Frame ID is {frame_id} with Gap {my_gap} \n [player fps = {received_fps}] [server fps = {current_srv_fps}] \n [player cps = {received_cps} [server cps = {current_cps}]] | bitrate = {bitrate}')
-                    bitrate = bitrate - (bitrate * 0.2) if bitrate_min <= bitrate <= bitrate_max else bitrate
-                    idx = received_fame_id - round(my_gap/2,) # Create the lag!  
-                    #time.sleep(0.0001)
-                    Nack_counter = Nack_counter + 1
-                    rate_ctl = ['Rate Fall & lagged', [0.2,1], bitrate,rate_ctl[3]]
-                    
-
-                else:
-                    print(f'(Nack) [Fast Decrease & lagged!] ==> Frame ID is {frame_id} with Gap {my_gap} \n [player fps = {received_fps}] [server fps = {current_srv_fps}] \n [player cps = {received_cps} [server cps = {current_cps}]] | bitrate = {bitrate}')
-                    bitrate = bitrate - (bitrate * 0.5) if bitrate_min <= bitrate <= bitrate_max else bitrate
-                    idx = received_fame_id - (my_gap/2)
-                    #time.sleep(0.0001)
-                    Nack_counter = Nack_counter + 1
-                    rate_ctl = ['Fast Decrease & lagged', [0.5,my_gap], bitrate,rate_ctl[3]]
-                #with open(rate_control_log, "a") as f: f.write(f"{frame_id},{rate_ctl}\n")
-
+                resend_idx = recovery.on_nack(frame_id) # forced IDR + rewind (or skip) policy
+                if resend_idx is not None:
+                    rewind_idx = resend_idx
+                    log.debug("(Nack) Resending from frame %s (last Ack %s)", frame_source.frame_id(resend_idx), recovery.last_acked)
 
             elif received_type=='command':
-                rate_ctl = [None, None, None, None]
-                rate_ctl[3] = 'command'
-
-                matching_commands = []
-                matching_commands = sync_df[sync_df['ID'] == (received_fame_id)] #received_fame_id] #expected_command_id]
-                my_cmd_number = matching_commands.shape[0]
+                my_cmd_number = sync_table.command_count(received_fame_id) # O(1) index lookup
                 cmd_counter = cmd_counter + my_cmd_number
-
-
-                if not matching_commands.empty:
-                    state = [None , None]
-                    if pause_frame_ids[cmd_counter-1] == matching_commands['ID'].iloc[0]:
-                        state[0] ='Sync'
-                        print(f"Sync***{my_gap}")
-                    else:
-                        print(f"Ooops***{my_gap}")
-                        state[0] = 'Not Sync'
-                    
-                    if my_gap <= window_min:
-                        bitrate = bitrate + (bitrate * Enc_Rate_jump) if bitrate_min <= bitrate <= bitrate_max else bitrate
-                        state[1] = 'Rate Jump'
-                        rate_ctl = ['Rate Jump',  Enc_Rate_jump,  bitrate,rate_ctl[3]]
-
-                    elif window_min < my_gap <= window_max:
-                        bitrate = bitrate + (bitrate * Enc_Rate_rise) if bitrate_min <= bitrate <= bitrate_max else bitrate
-                        state[1] = 'Rate Rise'
-                        rate_ctl = ['Rate Rise', Enc_Rate_rise,  bitrate,rate_ctl[3]]
-
-                    elif my_gap > window_max:
-                        bitrate = bitrate - (bitrate * Enc_Rate_fall) if bitrate_min <= bitrate <= bitrate_max else bitrate
-                        state[1] = 'Rate Fall'
-                        #idx = idx - my_gap
-                        rate_ctl = ['Fast Decrease & lagged',[Enc_Rate_fall, my_gap],  bitrate,rate_ctl[3]]
-                        continue
-                    
-                    print(f"{state} | Gap:{my_gap} | FID:{frame_id} | player FID:{received_fame_id}"
-                        f" player fps = {received_fps} | server fps = {current_srv_fps}"
-                        f" player cps = {received_cps} | server cps = {current_cps}, , rate = {bitrate} ") 
-                    
-
-                    #with open(server_log, "a") as f: 
-                        #f.write(f"{frame_id},{received_fame_id},{my_gap},{received_time},{send_time},{current_srv_fps},{received_fps},{current_cps},{received_cps},{current_srv_fps/received_fps},{received_cps/current_cps},{bitrate} \n")
-                        #print("Total is logging!")
+                matched = bool(my_cmd_number)
+                if my_cmd_number:
+                    sync_state = 'Sync' if pause_frame_ids[cmd_counter-1] == received_fame_id else 'Not Sync'
+                    log.debug("%s | Gap:%s | FID:%s | player FID:%s | player fps = %s | server fps = %s | player cps = %s | server cps = %s | rate = %s",
+                              sync_state, my_gap, frame_id, received_fame_id, received_fps, current_srv_fps, received_cps, current_cps, bitrate)
+                    if my_gap > window_max: # far behind the window: hold the current frame
+                        hold_frame = True
+
+            # Rate control policy (config rate_control.policy) -> new target bitrate
+            decision = rate_policy.update(RateSignal(received_type, my_gap, received_fps, received_cps, current_srv_fps,
+                                                     current_cps, send_time, received_time, matched))
+            bitrate = rate_policy.bitrate
+            if decision:
+                log.debug('(%s) [%s] ==> Frame ID %s with Gap %s | player fps = %s | server fps = %s | player cps = %s | server cps = %s | bitrate = %s',
+                          received_type, decision.action, frame_id, my_gap, received_fps, current_srv_fps, received_cps, current_cps, bitrate)
+                rate_control_logger.log(frame_id, decision.action, decision.factor, decision.gap, bitrate, received_type)
+            else:
+                rate_control_logger.log(frame_id, None, None, None, None, received_type)
+            last_gap = my_gap
+        encoded_kbps = None
+        if encoder_rate: # reconfigure the encoder (rate-limited) and log what it actually produces
+            bitrate = encoder_rate.apply(bitrate)
+            encoded_kbps = encoder_rate.encoded_kbps()
+            bitrate_logger.log(frame_id, bitrate, encoder_rate.applied, encoded_kbps, encoder_rate.updates)
+        summary.tick(current_srv_fps, last_gap, bitrate, encoded_kbps) # one INFO line per summary_interval
+        if rewind_idx is not None:
+            idx = rewind_idx
+            continue
+        if hold_frame:
+            continue
+        # Late frames skipped by the pacer ("drop" policy), up to the next frame whose ID carries commands
+        skipped = 0
+        while (skipped < dropped and idx + 1 + skipped < len(frame_source)
+               and not sync_table.command_count(frame_source.frame_id(idx + 1 + skipped))):
+            skipped += 1
+        idx= idx + 1 + skipped
+        
             
-                    state = [None , None]
+    if pacer:
+        jitter_mean, jitter_std, jitter_max = pacer.stats()
+        print(f"{tag}Pacing: {pacer.frames} frames at {fps} fps | jitter mean={jitter_mean:.3f} ms std={jitter_std:.3f} ms max={jitter_max:.3f} ms"
+              f" | dropped={pacer.dropped} re-anchored={pacer.reanchors}")
 
+    if rtp_sender:
+        print(f"{tag}RTP metadata: {rtp_sender.tagged}/{rtp_sender.packets} packets tagged (extension IDs {rtp_metadata_ext_id}, {rtp_metadata_ext_id + 1})")
 
+    print(f"{tag}Nack recovery ({recovery.policy}): {recovery.nacks} Nacks | {recovery.rewinds} rewinds ({recovery.resent} frames resent)"
+          f" | {recovery.skips} skips | {recovery.ignored} ignored | {recovery.keyframes} forced keyframes")
 
+    if encoder_rate:
+        encoded_mbit = encoder_rate.encoded_bytes * 8 / 1e6
+        print(f"{tag}Encoder bitrate: {encoder_rate.updates} updates | last applied {encoder_rate.applied:.0f} kbps | {encoded_mbit:.1f} Mbit encoded")
 
-            with open(rate_control_log, "a") as f: f.write(f"{frame_id},{rate_ctl}\n")        
-        idx= idx + 1
-        
-            
     # End the stream
     appsrc.emit("end-of-stream")
     pipeline.set_state(Gst.State.NULL)
+    frame_buffers.close()
+
+    if frame_probes:
+        frame_probes.close()
+        frames, keyframes, latency_mean, latency_p95, latency_max = frame_probes.stats()
+        print(f"{tag}Encoder profile {encoder_profile.name} ({myencoder}): {frames} frames ({keyframes} IDR) | encode latency mean={latency_mean:.2f} ms"
+              f" p95={latency_p95:.2f} ms max={latency_max:.2f} ms")
+
+    for logger in (rate_control_logger, server_logger, frame_logger, overlay_logger, pacing_logger, bitrate_logger, encode_logger,
+                   stages_logger):
+        logger.close()
 
 def load_config(file_path="config.txt"):
     """Reads the config.txt file and returns a dictionary of settings."""
@@ -551,7 +616,31 @@ if __name__ == "__main__":
     #print("All logs were removed in the beginning!")
     # Load configurations from the config.txt file
     # Call the stream_frames function
-    print(f'Started streaming to {cg_server_port}... ')
-    stream_frames(game_name)
+    if scream_state and len(sessions) > 1:
+        sys.exit("❌ SCReAM pipelines (sender.sh) support a single session only")
+
+    # One control socket for every session: a receiver thread timestamps the datagrams and routes them per session
+    router = SessionRouter()
+    control_queues = {session.name: router.add(session.session_id, (session.player_ip, session.player_port)) for session in sessions}
+    control_receiver = ControlReceiver(setup_socket(), router, batch=control_batch, rcvbuf=control_rcvbuf).start()
+
+    # Shared by the sessions: pre-decoded frame store (memory-mapped) or the PNG folder as fallback, and the tag cache
+    # Nack rewind re-reads resent frames: it always uses the store (built here if missing) instead of decoding PNGs again
+    rewind = recovery_policy == "rewind"
+    frame_source = open_frame_source(folder_path, frame_store_prefix, resolution, use_frame_store or rewind, prepare=rewind)
+    # QR overlay: pre-render the tiles of every frame up to stop_frm_number (compact payload, at most overlay.cache_size)
+    frame_tag = make_frame_tag(frame_tag_name, qr_size, strip_block)
+    overlay = OverlayEngine(resolution, frame_tag, qr_padding, qr_payload, qr_cache_size)
+    print(f"Pre-rendered {overlay.prerender([i for i in frame_source.frame_ids if i <= stop_frm_number])} {frame_tag.name} tiles ({overlay.payload} payload)")
+
+    placement.write_run_metadata(run_metadata, encoder=myencoder, encoder_profile=encoder_profile.describe(), sessions=[session._asdict() for session in sessions])
+    print(f"CPU placement: {placement.describe()} (run metadata: {run_metadata})")
+    print(f'Started streaming {len(sessions)} session(s): ' + ", ".join(f"{s.player_ip}:{s.player_port} from {s.stream_port}" for s in sessions))
+    run_sessions(sessions, stream_frames, control_queues, frame_source, overlay)
+
+    control_receiver.stop()
+    max_backlog = max(queue.max_backlog for queue in control_queues.values())
+    print(f"Control plane: {control_receiver.received} datagrams received | max backlog per frame = {max_backlog} | unrouted = {router.unrouted}"
+          f" | dropped = {control_receiver.dropped} | clock sync replies = {control_receiver.sync_replies}")
 
     
@@ -0,0 +1,92 @@
+'''
+# Date: 2026-10-18
+# Lab: LERIS/UFSCar
+# Project: CGReplay
+# Module: CG Server / Encoder Bitrate Control
+# Applies the rate controller's bitrate to the live encoder element (set_property, clamped to
+# bitrate_min/bitrate_max and rate-limited) and measures the bitrate actually produced by the
+# encoder from the sizes of its output buffers.
+'''
+
+import time
+from collections import deque
+
+import gi
+gi.require_version('Gst', '1.0')
+from gi.repository import Gst
+
+
+def clamp_bitrate(bitrate, bitrate_min, bitrate_max):
+    return min(max(bitrate, bitrate_min), bitrate_max)
+
+
+class EncoderBitrate:
+    """Drives the "bitrate" property of the encoder named `encoder_name` (kbps, x264enc/x265enc).
+
+    apply(bitrate) clamps the target and returns it (the rate controller keeps the clamped value,
+    so it can never leave [bitrate_min, bitrate_max]). The encoder is only reconfigured when the
+    target differs from the applied bitrate by at least min_change (relative) and min_interval
+    seconds passed since the last update; a target held back by the interval is applied by a later
+    apply() call. scale converts kbps to the property's unit (1000 for encoders in bit/s).
+
+    A probe on the encoder src pad sums the encoded buffer sizes: encoded_kbps() is the bitrate
+    produced over the last `window` seconds.
+    """
+
+    def __init__(self, pipeline, bitrate, bitrate_min, bitrate_max, encoder_name="encoder",
+                 min_interval=0.5, min_change=0.05, window=1.0, scale=1):
+        self.encoder = pipeline.get_by_name(encoder_name)
+        if self.encoder is None:
+            raise ValueError(f"No encoder element named '{encoder_name}' in the pipeline")
+        self.bitrate_min = bitrate_min
+        self.bitrate_max = bitrate_max
+        self.min_interval = min_interval
+        self.min_change = min_change
+        self.window = window
+        self.scale = scale
+        self.target = clamp_bitrate(bitrate, bitrate_min, bitrate_max)
+        self.applied = None             # bitrate currently configured in the encoder (kbps)
+        self.last_update = -float("inf")
+        self.updates = 0                # set_property calls
+
+        self.sizes = deque()            # (monotonic time, bytes) of the encoded buffers in the window
+        self.window_bytes = 0
+        self.encoded_bytes = 0
+        self.encoder.get_static_pad("src").add_probe(Gst.PadProbeType.BUFFER, self._on_buffer)
+        self._set(self.target, time.perf_counter())
+
+    def _set(self, bitrate, now):
+        self.encoder.set_property("bitrate", int(round(bitrate * self.scale)))
+        self.applied = bitrate
+        self.last_update = now
+        self.updates += 1
+
+    def apply(self, bitrate):
+        """Clamps the new target bitrate, reconfigures the encoder if allowed and returns the target."""
+        self.target = clamp_bitrate(bitrate, self.bitrate_min, self.bitrate_max)
+        now = time.perf_counter()
+        if (abs(self.target - self.applied) >= self.min_change * self.applied
+                and now - self.last_update >= self.min_interval):
+            self._set(self.target, now)
+        return self.target
+
+    def _on_buffer(self, pad, info):
+        size = info.get_buffer().get_size()
+        now = time.perf_counter()
+        self.sizes.append((now, size))
+        self.window_bytes += size
+        self.encoded_bytes += size
+        while self.sizes and now - self.sizes[0][0] > self.window:
+            self.window_bytes -= self.sizes.popleft()[1]
+        return Gst.PadProbeReturn.OK
+
+    def encoded_kbps(self):
+        """Bitrate produced by the encoder over the last `window` seconds (kbps)."""
+        sizes = self.sizes
+        if len(sizes) < 2:
+            return 0.0
+        try:
+            span = max(sizes[-1][0] - sizes[0][0], self.window / 2)
+            return self.window_bytes * 8 / 1000 / span
+        except IndexError:              # emptied by the streaming thread in between
+            return 0.0
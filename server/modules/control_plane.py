@@ -0,0 +1,131 @@
+'''
+# Date: 2026-10-18
+# Lab: LERIS/UFSCar
+# Project: CGReplay
+# Module: CG Server / Control Plane
+# Dedicated receive loop for the Ack/Nack/command datagrams of the player, decoupled from the frame push.
+# Clock sync requests (common/clock_sync.py) are answered right here, with their arrival timestamp.
+'''
+
+import select, socket, threading, time
+from collections import deque
+
+from common.clock_sync import answer_sync_request
+from common.log import get_logger
+from common.wire import is_sync_message, peek_session_id, split_datagram
+
+
+class ControlReceiver:
+    """Receive thread that drains every pending control datagram, timestamps it on arrival
+    (time.perf_counter()) and hands its messages (batched datagrams are split) to `router`, which
+    queues each one in the SessionQueue of its session (the only one with a single session).
+
+    The queues are collections.deque: append() from this thread and popleft() from the frame
+    loop are atomic, so no lock is taken on either side. Clock sync requests are answered by
+    this thread and never queued. A datagram that cannot be handled (malformed, stray) is logged, counted in
+    `dropped` and skipped: the thread never dies on one.
+    """
+
+    def __init__(self, sock, router, bufsize=65535, batch=64, rcvbuf=None, poll_timeout=0.1):
+        self.sock = sock
+        self.bufsize = bufsize
+        self.batch = batch                  # datagrams drained per wake-up (recvmmsg-style batching)
+        self.poll_timeout = poll_timeout
+        if rcvbuf:
+            self.sock.setsockopt(socket.SOL_SOCKET, socket.SO_RCVBUF, rcvbuf)
+        self.sock.setblocking(False)
+
+        self.router = router
+        self.received = 0                   # datagrams received
+        self.sync_replies = 0               # clock sync requests answered
+        self.dropped = 0                    # datagrams that could not be handled
+        self.log = get_logger("server.control")
+        self.running = False
+        self.thread = None
+
+    def start(self):
+        self.running = True
+        self.thread = threading.Thread(target=self._run, name="control-receiver", daemon=True)
+        self.thread.start()
+        return self
+
+    def stop(self):
+        self.running = False
+        if self.thread:
+            self.thread.join(timeout=1)
+
+    def _run(self):
+        sock, router = self.sock, self.router
+        while self.running:
+            ready_to_read, _, _ = select.select([sock], [], [], self.poll_timeout)
+            if not ready_to_read:
+                continue
+            for _ in range(self.batch):
+                try:
+                    data, addr = sock.recvfrom(self.bufsize)
+                except (BlockingIOError, InterruptedError):
+                    break
+                except OSError as e:  # e.g. ICMP port unreachable after a reply to a player that left
+                    self.log.debug("Control socket error: %s", e)
+                    continue
+                received_time = time.perf_counter()
+                self.received += 1
+                try:
+                    for message in split_datagram(data):
+                        if is_sync_message(message):
+                            self.sync_replies += answer_sync_request(sock, message, received_time, addr)
+                        else:
+                            router.route(received_time, message, addr)
+                except Exception as e:
+                    self.dropped += 1
+                    self.log.warning("Dropped control datagram (%d bytes) from %s: %s", len(data), addr, e)
+
+
+class SessionQueue:
+    """Control messages of one session (filled by the receiver thread, drained by the session's frame loop)."""
+
+    def __init__(self):
+        self.queue = deque()                # (received_time, data, addr)
+        self.max_backlog = 0
+
+    def drain(self):
+        """Yields every queued (received_time, data, addr), oldest first."""
+        queue = self.queue
+        self.max_backlog = max(self.max_backlog, len(queue))
+        while queue:
+            yield queue.popleft()
+
+
+class SessionRouter:
+    """Demultiplexes the control messages of several sessions arriving on one socket.
+
+    A binary message with a registered session_id goes to that session; otherwise the source
+    address (player IP, port) decides, then the source IP alone if a single session uses it.
+    With a single session, every message is routed to it (the original single-player behaviour).
+    Messages matching no session are counted in `unrouted` and dropped.
+    """
+
+    def __init__(self):
+        self.by_id = {}
+        self.by_addr = {}
+        self.by_ip = {}
+        self.sessions = []
+        self.unrouted = 0
+
+    def add(self, session_id, addr):
+        queue = SessionQueue()
+        if session_id:
+            self.by_id[session_id] = queue
+        self.by_addr[tuple(addr)] = queue
+        self.by_ip[addr[0]] = None if addr[0] in self.by_ip else queue  # shared IP: address match only
+        self.sessions.append(queue)
+        return queue
+
+    def route(self, received_time, message, addr):
+        queue = self.by_id.get(peek_session_id(message)) or self.by_addr.get(addr) or self.by_ip.get(addr[0])
+        if queue is None and len(self.sessions) == 1:
+            queue = self.sessions[0]
+        if queue is None:
+            self.unrouted += 1
+            return
+        queue.queue.append((received_time, message, addr))
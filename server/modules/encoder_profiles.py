@@ -0,0 +1,120 @@
+'''
+# Date: 2026-10-18
+# Lab: LERIS/UFSCar
+# Project: CGReplay
+# Module: CG Server / Encoder Profiles
+# Named sets of encoder element properties (config encoding.profiles.<profile>.<encoder>), validated
+# against the element (unknown / read-only properties, bad values) and applied before the pipeline
+# starts. The encode latency per profile is measured by modules/frame_probes.py.
+'''
+
+from collections import namedtuple
+
+import gi
+from gi.repository import GObject
+
+# bitrate_scale: units of the "bitrate" property per kbps; gop_property: max keyframe interval property
+EncoderInfo = namedtuple("EncoderInfo", "bitrate_scale gop_property")
+ENCODERS = {
+    "x264enc": EncoderInfo(1, "key-int-max"),
+    "x265enc": EncoderInfo(1, "key-int-max"),
+    "openh264enc": EncoderInfo(1000, "gop-size"),
+}
+
+
+INT_TYPES = (GObject.TYPE_INT, GObject.TYPE_UINT, GObject.TYPE_LONG, GObject.TYPE_ULONG, GObject.TYPE_INT64, GObject.TYPE_UINT64)
+FLOAT_TYPES = (GObject.TYPE_FLOAT, GObject.TYPE_DOUBLE)
+
+
+def _nick_value(values, name):
+    """Enum/flags member value by nick or name (values: the __enum_values__ / __flags_values__ of the type)."""
+    for number, member in values.items():
+        if name in (member.value_nick, member.value_name):
+            return number
+    raise ValueError(f"'{name}' is not one of {sorted(member.value_nick for member in values.values())}")
+
+
+def typed_value(spec, value):
+    """Config value -> Python value of the property's GType (enums/flags by nick or number, flags joined with '+')."""
+    fundamental = GObject.type_fundamental(spec.value_type)
+    if fundamental == GObject.TYPE_BOOLEAN:
+        if isinstance(value, str) and value.lower() in ("true", "false"):
+            return value.lower() == "true"
+        if isinstance(value, bool):
+            return value
+        raise ValueError(f"{value!r} is not a boolean")
+    if fundamental in INT_TYPES:
+        return int(value)
+    if fundamental in FLOAT_TYPES:
+        return float(value)
+    if fundamental == GObject.TYPE_STRING:
+        return str(value)
+    if fundamental == GObject.TYPE_ENUM:
+        return value if isinstance(value, int) else _nick_value(type(spec.default_value).__enum_values__, str(value))
+    if fundamental == GObject.TYPE_FLAGS:
+        if isinstance(value, int):
+            return value
+        values = type(spec.default_value).__flags_values__
+        flags = 0
+        for name in str(value).replace("|", "+").split("+"):
+            flags |= _nick_value(values, name.strip())
+        return flags
+    raise ValueError(f"unsupported property type {GObject.type_name(spec.value_type)}")
+
+
+def same_value(actual, expected):
+    if isinstance(expected, float):
+        return abs(float(actual) - expected) <= 1e-6 * max(1.0, abs(expected))
+    if isinstance(expected, int) and not isinstance(expected, bool):
+        return int(actual) == expected
+    return actual == expected
+
+
+class EncoderProfile:
+    """Properties of one encoder in a named profile (bitrate and GOP are set from encoding.*)."""
+
+    def __init__(self, name, encoder, properties):
+        if encoder not in ENCODERS:
+            raise ValueError(f"Unsupported encoder '{encoder}' (expected one of {tuple(ENCODERS)})")
+        self.name = name
+        self.encoder = encoder
+        self.info = ENCODERS[encoder]
+        self.properties = dict(properties or {})
+        for managed in ("bitrate", self.info.gop_property):
+            if managed in self.properties:
+                raise ValueError(f"Encoder profile '{name}': '{managed}' is set from encoding.* (starting_bitrate / GOP), not in the profile")
+
+    def apply(self, element, bitrate, gop):
+        """Validates and sets every property on the encoder element; raises ValueError on the first bad one."""
+        settings = dict(self.properties)
+        settings["bitrate"] = int(round(bitrate * self.info.bitrate_scale))
+        settings[self.info.gop_property] = gop
+        for prop, value in settings.items():
+            spec = element.find_property(prop)
+            if spec is None:
+                raise ValueError(f"Encoder profile '{self.name}': {self.encoder} has no property '{prop}'")
+            if not spec.flags & GObject.ParamFlags.WRITABLE:
+                raise ValueError(f"Encoder profile '{self.name}': {self.encoder} property '{prop}' is read-only")
+            try:
+                typed = typed_value(spec, value)
+            except (TypeError, ValueError) as e:
+                raise ValueError(f"Encoder profile '{self.name}': invalid value {value!r} for {self.encoder} property '{prop}': {e}")
+            # Out-of-range values are rejected by GObject with a warning only: read the property back
+            element.set_property(prop, typed)
+            if not same_value(element.get_property(prop), typed):
+                raise ValueError(f"Encoder profile '{self.name}': {self.encoder} rejected {prop}={value!r}"
+                                 f" (still {element.get_property(prop)!r}; out of range?)")
+
+    def describe(self):
+        return f"{self.name} ({self.encoder}: " + ", ".join(f"{k}={v}" for k, v in self.properties.items()) + ")"
+
+
+def load_encoder_profile(encoding, encoder):
+    """Profile encoding.profile for the given encoder element name (config encoding section)."""
+    name = encoding["profile"]
+    profiles = encoding["profiles"]
+    if name not in profiles:
+        raise ValueError(f"Unknown encoder profile '{name}' (expected one of {tuple(profiles)})")
+    if encoder not in profiles[name]:
+        raise ValueError(f"Encoder profile '{name}' has no settings for {encoder} (has {tuple(profiles[name])})")
+    return EncoderProfile(name, encoder, profiles[name][encoder])
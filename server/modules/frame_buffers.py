@@ -0,0 +1,75 @@
+'''
+# Date: 2026-10-18
+# Lab: LERIS/UFSCar
+# Project: CGReplay
+# Module: CG Server / Frame Buffers
+# Frames are loaded and stamped straight into the memory of the Gst buffer that is pushed to appsrc
+# (a Gst.BufferPool of frame-sized buffers, mapped writable as a numpy view), instead of a reusable
+# array copied again by tobytes() and Gst.Buffer.new_wrapped() on every push.
+'''
+
+import numpy as np
+import gi
+gi.require_version('Gst', '1.0')
+from gi.repository import Gst
+
+
+class FrameBuffers:
+    """Frame-sized Gst buffers filled in place.
+
+    fill(fill_fn) acquires a buffer from the pool, calls fill_fn(frame) with a writable
+    (height, width, 3) uint8 view of its memory and returns (buffer, fill_fn's result). The view only
+    lives during the call: fill_fn must not keep it. Pushed buffers go back to the pool once the
+    pipeline releases them, so their memory is reused instead of reallocated per frame.
+
+    Writable mapped memory needs the gst-python overrides (Gst.MapInfo.data as a memoryview); without
+    them `zero_copy` is False and frames are filled in one reusable array copied into a new buffer.
+    """
+
+    def __init__(self, caps, width, height, min_buffers=4):
+        self.shape = (height, width, 3)
+        self.size = width * height * 3
+        self.pool = Gst.BufferPool()
+        config = self.pool.get_config()
+        Gst.BufferPool.config_set_params(config, caps, self.size, min_buffers, 0)
+        self.pool.set_config(config)
+        self.pool.set_active(True)
+        self.array = None               # fallback frame (no writable mapping)
+        self.zero_copy = self._writable()
+        if not self.zero_copy:
+            self.array = np.empty(self.shape, dtype=np.uint8)
+
+    def _acquire(self):
+        result, buffer = self.pool.acquire_buffer(None)
+        if result != Gst.FlowReturn.OK:
+            raise RuntimeError(f"Frame buffer pool: acquire failed ({result})")
+        return buffer
+
+    def _writable(self):
+        buffer = self._acquire()
+        ok, info = buffer.map(Gst.MapFlags.WRITE)
+        if not ok:
+            return False
+        try:
+            return isinstance(info.data, memoryview) and not info.data.readonly
+        finally:
+            buffer.unmap(info)
+
+    def fill(self, fill_fn):
+        if not self.zero_copy:
+            result = fill_fn(self.array)
+            return Gst.Buffer.new_wrapped(self.array.tobytes()), result
+        buffer = self._acquire()
+        ok, info = buffer.map(Gst.MapFlags.WRITE)
+        if not ok:
+            raise RuntimeError("Frame buffer pool: could not map a buffer for writing")
+        try:
+            frame = np.ndarray(self.shape, dtype=np.uint8, buffer=info.data)
+            result = fill_fn(frame)
+            del frame                   # no export of the mapped memory may outlive the mapping
+        finally:
+            buffer.unmap(info)
+        return buffer, result
+
+    def close(self):
+        self.pool.set_active(False)
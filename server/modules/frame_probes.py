@@ -0,0 +1,138 @@
+'''
+# Date: 2026-10-18
+# Lab: LERIS/UFSCar
+# Project: CGReplay
+# Module: CG Server / Per-Frame Pipeline Probes
+# Pad probes following each frame through the server pipeline, matched by PTS:
+#   appsrc src        : frame ID and capture time (queued by push()) <-> PTS, time the frame enters the pipeline
+#   encoder sink/src  : encode latency, encoded size, frame type (IDR = buffer without DELTA_UNIT)
+#   payloader src     : RTP packets and bytes of the frame (rtph26xpay pushes buffer lists)
+# A frame is complete when the payloader moves on to a later PTS (or at close()).
+'''
+
+import time
+from collections import OrderedDict, deque
+
+import numpy as np
+import gi
+gi.require_version('Gst', '1.0')
+from gi.repository import Gst
+
+
+class FrameRecord:
+    __slots__ = ("frame_id", "pts", "captured", "pushed", "encode_start", "encode_end", "sent", "size", "keyframe",
+                 "packets", "rtp_bytes")
+
+    def __init__(self, frame_id, pts, captured, pushed):
+        self.frame_id = frame_id
+        self.pts = pts
+        self.captured = captured        # perf_counter() given to push() (frame loaded by the server loop)
+        self.pushed = pushed            # perf_counter() at the appsrc src pad
+        self.encode_start = self.encode_end = None
+        self.sent = None                # perf_counter() at the last RTP packet
+        self.size = None                # encoded bytes
+        self.keyframe = None
+        self.packets = self.rtp_bytes = 0
+
+
+class FrameProbes:
+    """Per-frame instrumentation of a server pipeline (appsrc "source" -> encoder -> payloader).
+
+    push(frame_id, captured) is called right before the frame is pushed to appsrc. on_frame(record) is called
+    from the streaming thread once per completed frame (e.g. to log it); records whose frame never
+    left the encoder have size None. Memory stays bounded over a session: the encode latency mean
+    and max are running values, its p95 is over the last latency_window frames.
+    """
+
+    def __init__(self, appsrc, encoder, payloader, on_frame=None, history=64, latency_window=4096):
+        self.on_frame = on_frame
+        self.history = history
+        self.pending = deque()          # (frame ID, capture time) pushed, not yet timestamped
+        self.records = OrderedDict()    # PTS -> FrameRecord, in push order
+        self.frames = self.keyframes = 0
+        self.encode_latencies = deque(maxlen=latency_window)  # ms, last frames (p95)
+        self.encode_sum = self.encode_max = 0.0                # ms, every frame
+        self.encoded = 0                # frames with an encode latency
+        appsrc.get_static_pad("src").add_probe(Gst.PadProbeType.BUFFER, self._on_source)
+        encoder.get_static_pad("sink").add_probe(Gst.PadProbeType.BUFFER, self._on_encoder_input)
+        encoder.get_static_pad("src").add_probe(Gst.PadProbeType.BUFFER, self._on_encoder_output)
+        payloader.get_static_pad("src").add_probe(Gst.PadProbeType.BUFFER | Gst.PadProbeType.BUFFER_LIST,
+                                                  self._on_packets)
+
+    def push(self, frame_id, captured=None):
+        self.pending.append((frame_id, captured))
+
+    def _on_source(self, pad, info):
+        pts = info.get_buffer().pts
+        frame_id, captured = self.pending.popleft() if self.pending else (None, None)
+        self.records[pts] = FrameRecord(frame_id, pts, captured, time.perf_counter())
+        while len(self.records) > self.history:
+            self._complete(self.records.popitem(last=False)[1])
+        return Gst.PadProbeReturn.OK
+
+    def _on_encoder_input(self, pad, info):
+        record = self.records.get(info.get_buffer().pts)
+        if record is not None:
+            record.encode_start = time.perf_counter()
+        return Gst.PadProbeReturn.OK
+
+    def _on_encoder_output(self, pad, info):
+        buffer = info.get_buffer()
+        record = self.records.get(buffer.pts)
+        if record is not None:
+            record.encode_end = time.perf_counter()
+            record.size = buffer.get_size()
+            record.keyframe = not buffer.has_flags(Gst.BufferFlags.DELTA_UNIT)
+        return Gst.PadProbeReturn.OK
+
+    def _on_packets(self, pad, info):
+        buffers = info.get_buffer_list() if info.type & Gst.PadProbeType.BUFFER_LIST else None
+        if buffers is not None:
+            packets = [buffers.get(i) for i in range(buffers.length())]
+        else:
+            packets = [info.get_buffer()]
+        if not packets:
+            return Gst.PadProbeReturn.OK
+        pts = packets[0].pts
+        record = self.records.get(pts)
+        if record is not None:
+            record.packets += len(packets)
+            record.rtp_bytes += sum(packet.get_size() for packet in packets)
+            record.sent = time.perf_counter()
+        while self.records:             # frames before this PTS get no more packets
+            if next(iter(self.records)) >= pts:
+                break
+            self._complete(self.records.popitem(last=False)[1])
+        return Gst.PadProbeReturn.OK
+
+    def _complete(self, record):
+        self.frames += 1
+        if record.keyframe:
+            self.keyframes += 1
+        if record.encode_start is not None and record.encode_end is not None:
+            latency = (record.encode_end - record.encode_start) * 1000
+            self.encode_latencies.append(latency)
+            self.encode_sum += latency
+            self.encode_max = max(self.encode_max, latency)
+            self.encoded += 1
+        if self.on_frame:
+            self.on_frame(record)
+
+    def close(self):
+        """Completes the frames still in flight (call after the pipeline stopped)."""
+        while self.records:
+            self._complete(self.records.popitem(last=False)[1])
+
+    @staticmethod
+    def stages(record):
+        """(convert, encode, packetize) ms of a record: appsrc -> encoder input -> encoder output -> last packet."""
+        def ms(start, end):
+            return (end - start) * 1000 if start is not None and end is not None else None
+        return ms(record.pushed, record.encode_start), ms(record.encode_start, record.encode_end), ms(record.encode_end, record.sent)
+
+    def stats(self):
+        """(frames, keyframes, encode latency mean, p95 (last latency_window frames), max in ms)."""
+        if not self.encoded:
+            return self.frames, self.keyframes, 0.0, 0.0, 0.0
+        return (self.frames, self.keyframes, self.encode_sum / self.encoded,
+                np.percentile(self.encode_latencies, 95), self.encode_max)
@@ -0,0 +1,131 @@
+'''
+# Date: 2026-10-18
+# Lab: LERIS/UFSCar
+# Project: CGReplay
+# Module: CG Server / Frame Store
+# Pre-decoded frames: a game folder (./Forza, ./Fortnite, ./Kombat) is decoded and resized
+# once into a single raw BGR file (<prefix>.bgr) with a JSON index (<prefix>.json).
+'''
+
+import os, json, cv2
+import numpy as np
+
+STORE_VERSION = 1
+
+
+def store_paths(store_prefix):
+    """Returns the (raw frames, index) file paths of a frame store."""
+    return f"{store_prefix}.bgr", f"{store_prefix}.json"
+
+
+def list_png_frames(frame_dir):
+    """Sorted PNG file names of a game folder (the file name is the frame ID)."""
+    return sorted([f for f in os.listdir(frame_dir) if f.endswith(".png")])
+
+
+def prepare_frame_store(frame_dir, store_prefix, resolution):
+    """Decodes and resizes every PNG in frame_dir once and writes them back to back into the store."""
+    width, height = resolution
+    raw_path, index_path = store_paths(store_prefix)
+    os.makedirs(os.path.dirname(raw_path) or ".", exist_ok=True)
+
+    frame_ids = []
+    with open(raw_path, "wb") as raw_file:
+        for file in list_png_frames(frame_dir):
+            frame = cv2.imread(os.path.join(frame_dir, file))
+            if frame is None:
+                print(f"Could not load frame {file}")
+                continue
+            frame = cv2.resize(frame, resolution, interpolation=cv2.INTER_AREA)
+            np.ascontiguousarray(frame).tofile(raw_file)
+            frame_ids.append(int(file.split('.')[0]))
+
+    index = {
+        "version": STORE_VERSION,
+        "source": frame_dir,
+        "width": width,
+        "height": height,
+        "channels": 3,
+        "frame_size": width * height * 3,
+        "frame_ids": frame_ids,
+    }
+    with open(index_path, "w") as f:
+        json.dump(index, f)
+    return index
+
+
+class FrameStore:
+    """Memory-mapped, read-only access to a prepared frame store."""
+
+    def __init__(self, store_prefix, resolution):
+        raw_path, index_path = store_paths(store_prefix)
+        with open(index_path, "r") as f:
+            index = json.load(f)
+
+        if index["version"] != STORE_VERSION:
+            raise ValueError(f"{index_path}: unsupported frame store version {index['version']}")
+        if (index["width"], index["height"]) != tuple(resolution):
+            raise ValueError(f"{index_path}: store was prepared at {index['width']}x{index['height']}, "
+                             f"but encoding.resolution is {resolution[0]}x{resolution[1]} (run prepare_frames.py again)")
+
+        self.frame_ids = index["frame_ids"]
+        self.resolution = (index["width"], index["height"])
+        self.frames = np.memmap(raw_path, dtype=np.uint8, mode="r",
+                                shape=(len(self.frame_ids), index["height"], index["width"], 3))
+
+    def __len__(self):
+        return len(self.frame_ids)
+
+    def frame_id(self, idx):
+        return self.frame_ids[idx]
+
+    def frame(self, idx):
+        """Zero-copy view of frame #idx (backed by the page cache)."""
+        return self.frames[idx]
+
+    def load(self, idx, out):
+        """Copies frame #idx into the caller's buffer (one memcpy, no decode)."""
+        np.copyto(out, self.frames[idx])
+        return out
+
+
+class PngFrameSource:
+    """Fallback source that decodes the PNG folder on the fly (the original replay path)."""
+
+    def __init__(self, frame_dir, resolution):
+        self.frame_dir = frame_dir
+        self.resolution = tuple(resolution)
+        self.png_files = list_png_frames(frame_dir)
+        self.frame_ids = [int(f.split('.')[0]) for f in self.png_files]
+
+    def __len__(self):
+        return len(self.png_files)
+
+    def frame_id(self, idx):
+        return self.frame_ids[idx]
+
+    def frame(self, idx):
+        frame = cv2.imread(os.path.join(self.frame_dir, self.png_files[idx]))
+        if frame is None:
+            return None
+        return cv2.resize(frame, self.resolution, interpolation=cv2.INTER_AREA)
+
+    def load(self, idx, out):
+        frame = cv2.imread(os.path.join(self.frame_dir, self.png_files[idx]))
+        if frame is None:
+            return None
+        return cv2.resize(frame, self.resolution, dst=out, interpolation=cv2.INTER_AREA)
+
+
+def open_frame_source(frame_dir, store_prefix, resolution, use_frame_store=True, prepare=False):
+    """Opens the prepared frame store when available (prepare=True: builds a missing one first),
+    otherwise falls back to decoding PNGs."""
+    if use_frame_store and store_prefix and prepare and not os.path.exists(store_paths(store_prefix)[1]):
+        print(f"Preparing frame store {store_prefix} from {frame_dir} ...")
+        prepare_frame_store(frame_dir, store_prefix, resolution)
+    if use_frame_store and store_prefix and os.path.exists(store_paths(store_prefix)[1]):
+        print(f"Using prepared frame store {store_prefix}")
+        return FrameStore(store_prefix, resolution)
+    if use_frame_store:
+        print(f"⚠️  Frame store {store_prefix} not found (run prepare_frames.py); decoding PNGs from {frame_dir}")
+    return PngFrameSource(frame_dir, resolution)
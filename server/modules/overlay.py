@@ -0,0 +1,96 @@
+'''
+# Date: 2026-10-18
+# Lab: LERIS/UFSCar
+# Project: CGReplay
+# Module: CG Server / Frame ID Overlay
+# Pre-rendered frame tag tiles (QR code or block strip, see common/frame_tags.py) keyed by frame ID,
+# kept in an LRU cache, so that the overlay in the streaming loop is a numpy blit instead of a
+# pure-Python QR build + PIL + resize per frame.
+'''
+
+import threading
+from collections import OrderedDict
+
+from common.frame_tags import QRTag, placement
+from common.log import get_logger
+
+PAYLOADS = ("full", "compact")
+
+
+class OverlayEngine:
+    """Stamps the frame tag onto the bottom-right corner of each frame.
+
+    payload="full"    : legacy QR text (ID, rcv_timestamp, resolution, bitrate), rendered per frame.
+    payload="compact" : only ID and resolution in the QR (cacheable); rcv_timestamp and bitrate
+                        are carried out-of-band (see the server log_overlay file).
+    A tag that carries no text (strip) only encodes the frame ID, so it is always cached and
+    behaves as the compact payload. One engine can be shared by several sessions (threads).
+    """
+
+    def __init__(self, resolution, tag=None, padding=10, payload="full", cache_size=4096):
+        if payload not in PAYLOADS:
+            raise ValueError(f"Unknown overlay payload '{payload}' (expected one of {PAYLOADS})")
+        self.resolution = tuple(resolution)
+        self.tag = tag if tag is not None else QRTag()
+        self.payload = payload if self.tag.carries_text else "compact"
+        self.cache_size = cache_size
+        self.cache = OrderedDict()      # frame_id -> tag.height x tag.width x 3 tile
+        self.lock = threading.Lock()    # cache shared by the sessions
+        self.hits = self.misses = 0
+
+        # Overlay position: 10px padding from the right and bottom edges by default (aligned for the strip)
+        self.x_offset, self.y_offset = placement(resolution[0], resolution[1], self.tag.width,
+                                                 self.tag.height, padding, self.tag.align)
+
+    def qr_data(self, frame_id, timestamp, bitrate):
+        if self.payload == "compact":
+            return f"Frame ID: {frame_id}, resolution: {self.resolution}"
+        return f"Frame ID: {frame_id}, rcv_timestamp: {timestamp}, resolution: {self.resolution},bitrate:{bitrate}"
+
+    def tile(self, frame_id):
+        """Cached compact tile for frame_id (rendered on a miss, least recently used is evicted)."""
+        with self.lock:
+            tile = self.cache.get(frame_id)
+            if tile is not None:
+                self.hits += 1
+                self.cache.move_to_end(frame_id)
+                return tile
+            self.misses += 1
+
+        tile = self.tag.render(frame_id, self.qr_data(frame_id, None, None))
+        with self.lock:
+            self.cache[frame_id] = tile
+            if len(self.cache) > self.cache_size:
+                self.cache.popitem(last=False)
+        return tile
+
+    def prerender(self, frame_ids):
+        """Renders the tiles of the given frame IDs ahead of streaming (compact payload only).
+
+        At most cache_size tiles (the first frame IDs, streamed first) are rendered: beyond that each
+        tile would evict one rendered earlier and every frame would miss the cache while streaming.
+        """
+        if self.payload != "compact":
+            return 0
+        frame_ids = list(frame_ids)
+        if len(frame_ids) > self.cache_size:
+            get_logger("server.overlay").warning("Overlay cache_size %d < %d frames to pre-render: only the first %d are"
+                                                 " pre-rendered (raise overlay.cache_size to cache them all)",
+                                                 self.cache_size, len(frame_ids), self.cache_size)
+            frame_ids = frame_ids[:self.cache_size]
+        for frame_id in frame_ids:
+            if frame_id not in self.cache:
+                self.tile(frame_id)
+        self.misses = 0
+        return len(self.cache)
+
+    def apply(self, frame, frame_id, timestamp, bitrate):
+        """Overlays the frame tag in place and returns the tag text that was encoded."""
+        qr_data = self.qr_data(frame_id, timestamp, bitrate)
+        if self.payload == "compact":
+            tile = self.tile(frame_id)
+        else:
+            tile = self.tag.render(frame_id, qr_data)
+
+        frame[self.y_offset:self.y_offset + self.tag.height, self.x_offset:self.x_offset + self.tag.width] = tile
+        return qr_data
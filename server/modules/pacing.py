@@ -0,0 +1,88 @@
+'''
+# Date: 2026-10-18
+# Lab: LERIS/UFSCar
+# Project: CGReplay
+# Module: CG Server / Frame Pacing
+# Deadline-based scheduler: frame n is due at start + n/fps on the monotonic clock.
+'''
+
+import math, time
+
+LATE_POLICIES = ("catchup", "drop")
+
+
+class FramePacer:
+    """Emits frames at exactly `fps` and gives each one an explicit PTS/duration.
+
+    late_policy="catchup": late frames are pushed back to back until the schedule is met again;
+                           beyond max_late_frames the schedule is re-anchored (no long bursts).
+    late_policy="drop"   : beyond max_late_frames, the slots that already passed are skipped
+                           and wait() returns how many frames the caller should drop.
+    """
+
+    def __init__(self, fps, late_policy="catchup", max_late_frames=3):
+        if late_policy not in LATE_POLICIES:
+            raise ValueError(f"Unknown pacing late_policy '{late_policy}' (expected one of {LATE_POLICIES})")
+        self.period = 1.0 / fps
+        self.duration_ns = int(round(1e9 / fps))
+        self.late_policy = late_policy
+        self.max_late = max_late_frames * self.period
+
+        self.origin = None      # monotonic time of the first deadline (PTS 0)
+        self.start = None       # anchor of the current schedule
+        self.slot = 0           # slot of the frame being emitted
+        self.deadline = None
+        self.lateness = 0.0     # emission time - deadline of the last frame (s)
+        self.waited = 0.0       # time slept before the last frame (s)
+
+        # Jitter statistics (lateness of each emitted frame)
+        self.frames = self.dropped = self.reanchors = 0
+        self.jitter_sum = self.jitter_sq_sum = self.jitter_max = 0.0
+
+    def wait(self):
+        """Sleeps until the deadline of the current slot; returns the number of frames to drop."""
+        now = time.monotonic()
+        if self.start is None:
+            self.origin = self.start = now
+
+        self.deadline = self.start + self.slot * self.period
+        self.waited = max(self.deadline - now, 0.0)
+        if self.waited > 0:
+            time.sleep(self.waited)
+            now = time.monotonic()
+
+        dropped = 0
+        lateness = now - self.deadline
+        if lateness > self.max_late:
+            if self.late_policy == "drop":
+                dropped = int(lateness // self.period)
+                self.slot += dropped
+                self.dropped += dropped
+            else:
+                self.start += lateness  # re-anchor the schedule on the current time
+                self.reanchors += 1
+            self.deadline = self.start + self.slot * self.period
+            lateness = max(now - self.deadline, 0.0)
+
+        self.lateness = lateness
+        self.frames += 1
+        self.jitter_sum += lateness
+        self.jitter_sq_sum += lateness * lateness
+        self.jitter_max = max(self.jitter_max, lateness)
+        return dropped
+
+    def pts(self):
+        """PTS (ns, relative to the first frame) of the current slot."""
+        return int(round((self.deadline - self.origin) * 1e9))
+
+    def advance(self):
+        """Moves to the next slot (call after each pushed buffer)."""
+        self.slot += 1
+
+    def stats(self):
+        """Returns (mean, std, max) jitter in milliseconds."""
+        if self.frames == 0:
+            return 0.0, 0.0, 0.0
+        mean = self.jitter_sum / self.frames
+        std = math.sqrt(max(self.jitter_sq_sum / self.frames - mean * mean, 0.0))
+        return mean * 1000, std * 1000, self.jitter_max * 1000
@@ -0,0 +1,223 @@
+'''
+# Date: 2026-10-18
+# Lab: LERIS/UFSCar
+# Project: CGReplay
+# Module: CG Server / Rate Control Policies
+# Encoder rate control behind one small interface: each control message (Ack/Nack/command) becomes
+# a RateSignal, the selected policy turns it into a target bitrate. Policies (config rate_control.policy):
+#   sliding_window : the original CGReplay controller (jump/rise/decrese/fall against window_min/window_max)
+#   aimd           : additive increase on Ack, multiplicative decrease on Nack or a gap beyond the window
+#   delay_gradient : GCC-style trendline of the one-way delay variation (send/receive timestamps)
+#   hold           : bitrate never changes (baseline; used under SCReAM, which adapts the rate itself)
+'''
+
+from collections import deque, namedtuple
+
+from modules.bitrate_control import clamp_bitrate
+
+# One control message as seen by the rate controller
+#   type: 'Ack' / 'Nack' / 'command', gap: frames between the streamed and the received frame,
+#   fps/cps: player rates, server_fps/server_cps: server rates, send_time: player clock (s),
+#   received_time: server clock (s), matched: a command found in the sync table (True for Ack/Nack)
+RateSignal = namedtuple("RateSignal", "type gap fps cps server_fps server_cps send_time received_time matched")
+
+# What a policy did: logged as action, factor, gap (srv_codec_bitrate); None = bitrate unchanged
+RateDecision = namedtuple("RateDecision", "action factor gap")
+
+
+class RatePolicy:
+    """Base policy: keeps the current target bitrate (kbps) within [bitrate_min, bitrate_max].
+
+    update(signal) returns a RateDecision when it changed the bitrate (None otherwise); the
+    new target is self.bitrate.
+    """
+
+    name = "hold"
+
+    def __init__(self, bitrate, bitrate_min, bitrate_max):
+        self.bitrate_min = bitrate_min
+        self.bitrate_max = bitrate_max
+        self.bitrate = clamp_bitrate(bitrate, bitrate_min, bitrate_max)
+
+    def scale(self, factor):
+        self.bitrate = clamp_bitrate(self.bitrate * factor, self.bitrate_min, self.bitrate_max)
+
+    def update(self, signal):
+        return None
+
+
+class SlidingWindowPolicy(RatePolicy):
+    """The original controller: the gap between the streamed and acknowledged frame is compared
+    to the sync window. Ack: jump (gap <= window_min), rise (inside the window) or decrease
+    (beyond it); Nack: -20%; matched command: jump, rise or fall."""
+
+    name = "sliding_window"
+
+    def __init__(self, bitrate, bitrate_min, bitrate_max, window_min=1, window_max=4,
+                 jump=1.0, rise=0.3, decrease=0.1, fall=0.5):
+        super().__init__(bitrate, bitrate_min, bitrate_max)
+        self.window_min = window_min
+        self.window_max = window_max
+        self.jump = jump
+        self.rise = rise
+        self.decrease = decrease
+        self.fall = fall
+
+    def update(self, signal):
+        gap = signal.gap
+        if signal.type == 'Nack':
+            self.scale(1 - 0.2)
+            return RateDecision('Rate Fall & lagged', 0.2, gap)
+        if not signal.matched:
+            return None
+        if gap <= self.window_min:
+            self.scale(1 + self.jump)
+            return RateDecision('Rate Jump', self.jump, None)
+        if gap <= self.window_max:
+            self.scale(1 + self.rise)
+            return RateDecision('Rate Rise', self.rise, None)
+        if signal.type == 'Ack':
+            self.scale(1 - self.decrease)
+            return RateDecision('Rate Decrease', self.decrease, None)
+        self.scale(1 - self.fall)
+        return RateDecision('Fast Decrease & lagged', self.fall, gap)
+
+
+class AimdPolicy(RatePolicy):
+    """Additive increase (`increase` kbps per Ack/matched command within the window),
+    multiplicative decrease (x `decrease`) on a Nack or a gap beyond gap_threshold, at most once
+    per decrease_interval seconds so that one congestion event is not counted per message."""
+
+    name = "aimd"
+
+    def __init__(self, bitrate, bitrate_min, bitrate_max, increase=100, decrease=0.5, gap_threshold=4,
+                 decrease_interval=0.5):
+        super().__init__(bitrate, bitrate_min, bitrate_max)
+        self.increase = increase
+        self.decrease = decrease
+        self.gap_threshold = gap_threshold
+        self.decrease_interval = decrease_interval
+        self.last_decrease = -float("inf")
+
+    def update(self, signal):
+        if signal.type == 'Nack' or signal.gap > self.gap_threshold:
+            if signal.received_time - self.last_decrease < self.decrease_interval:
+                return None
+            self.last_decrease = signal.received_time
+            self.scale(self.decrease)
+            return RateDecision('AIMD Decrease', self.decrease, signal.gap)
+        if not signal.matched:
+            return None
+        self.bitrate = clamp_bitrate(self.bitrate + self.increase, self.bitrate_min, self.bitrate_max)
+        return RateDecision('AIMD Increase', self.increase, None)
+
+
+class DelayGradientPolicy(RatePolicy):
+    """GCC-style delay-based controller on the player -> server control messages.
+
+    The delay variation between consecutive messages, (received_i - received_i-1) - (send_i - send_i-1),
+    is independent of the clock offset between player and server. Its accumulated value is smoothed
+    and a least-squares trendline over the last `window` messages gives the delay slope; the scaled
+    slope is compared to an adaptive threshold (k_up/k_down) to detect overuse / underuse.
+    Overuse: x `decrease` (at most once per decrease_interval seconds); normal: multiplicative
+    increase of `increase` per second; underuse: hold.
+    A Nack is a loss signal: x `nack_decrease`.
+    """
+
+    name = "delay_gradient"
+
+    def __init__(self, bitrate, bitrate_min, bitrate_max, window=20, smoothing=0.9, gain=4.0,
+                 threshold_ms=12.5, increase=0.08, decrease=0.85, nack_decrease=0.8, decrease_interval=0.3,
+                 k_up=0.0087, k_down=0.039):
+        super().__init__(bitrate, bitrate_min, bitrate_max)
+        self.smoothing = smoothing
+        self.gain = gain
+        self.threshold = threshold_ms
+        self.increase = increase
+        self.decrease = decrease
+        self.nack_decrease = nack_decrease
+        self.decrease_interval = decrease_interval
+        self.last_decrease = -float("inf")
+        self.k_up = k_up
+        self.k_down = k_down
+        self.samples = deque(maxlen=window)     # (arrival time ms, smoothed accumulated delay ms)
+        self.previous = None                    # (send_time, received_time) of the previous message
+        self.accumulated = self.smoothed = 0.0
+        self.count = 0
+        self.first_arrival = None
+        self.last_update = None                 # received_time of the last threshold update / increase
+        self.state = "normal"
+        self.trend = 0.0                        # last modified trend (ms)
+
+    def _trend(self, signal):
+        """Feeds one message to the trendline filter; returns the modified trend or None."""
+        try:
+            send_time = float(signal.send_time)
+        except (TypeError, ValueError):
+            return None
+        previous, self.previous = self.previous, (send_time, signal.received_time)
+        if previous is None:
+            self.first_arrival = signal.received_time
+            return None
+        variation = ((signal.received_time - previous[1]) - (send_time - previous[0])) * 1000
+        self.accumulated += variation
+        self.smoothed = self.smoothing * self.smoothed + (1 - self.smoothing) * self.accumulated
+        self.count += 1
+        self.samples.append(((signal.received_time - self.first_arrival) * 1000, self.smoothed))
+        if len(self.samples) < self.samples.maxlen:
+            return None
+        n = len(self.samples)
+        mean_x = sum(x for x, _ in self.samples) / n
+        mean_y = sum(y for _, y in self.samples) / n
+        denominator = sum((x - mean_x) ** 2 for x, _ in self.samples)
+        if denominator == 0:
+            return None
+        slope = sum((x - mean_x) * (y - mean_y) for x, y in self.samples) / denominator
+        return min(self.count, 60) * slope * self.gain
+
+    def _detect(self, trend, now):
+        if trend > self.threshold:
+            self.state = "overuse"
+        elif trend < -self.threshold:
+            self.state = "underuse"
+        else:
+            self.state = "normal"
+        if self.last_update is not None and abs(trend) < self.threshold + 15:   # adaptive threshold
+            k = self.k_down if abs(trend) < self.threshold else self.k_up
+            dt_ms = min((now - self.last_update) * 1000, 100)
+            self.threshold = min(max(self.threshold + k * (abs(trend) - self.threshold) * dt_ms, 6), 600)
+
+    def update(self, signal):
+        trend = self._trend(signal)
+        now = signal.received_time
+        if signal.type == 'Nack':
+            self.last_update = self.last_decrease = now
+            self.scale(self.nack_decrease)
+            return RateDecision('Loss Decrease', self.nack_decrease, signal.gap)
+        if trend is None:
+            return None
+        self.trend = trend
+        self._detect(trend, now)
+        elapsed = 0 if self.last_update is None else min(now - self.last_update, 1.0)
+        self.last_update = now
+        if self.state == "overuse":
+            if now - self.last_decrease < self.decrease_interval:
+                return None
+            self.last_decrease = now
+            self.scale(self.decrease)
+            return RateDecision('Delay Decrease', self.decrease, signal.gap)
+        if self.state == "normal" and elapsed > 0:
+            factor = (1 + self.increase) ** elapsed
+            self.scale(factor)
+            return RateDecision('Delay Increase', factor - 1, None)
+        return None
+
+
+RATE_POLICIES = {policy.name: policy for policy in (SlidingWindowPolicy, AimdPolicy, DelayGradientPolicy, RatePolicy)}
+
+
+def make_rate_policy(name, bitrate, bitrate_min, bitrate_max, **options):
+    """Policy by name (config rate_control.policy); options are its keyword arguments."""
+    if name not in RATE_POLICIES:
+        raise ValueError(f"Unknown rate control policy '{name}' (expected one of {tuple(RATE_POLICIES)})")
+    return RATE_POLICIES[name](bitrate, bitrate_min, bitrate_max, **options)
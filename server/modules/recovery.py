@@ -0,0 +1,101 @@
+'''
+# Date: 2026-10-18
+# Lab: LERIS/UFSCar
+# Project: CGReplay
+# Module: CG Server / Nack Recovery
+# What the server does when the player reports an undecodable frame (Nack): a bounded ring keeps the
+# frame source index of the last frames pushed to the encoder, the policy decides to resend from the
+# frame after the last Ack (rewind) or to keep going (skip), and the encoder is asked for an IDR frame
+# (force-key-unit) so the player's decoder recovers with one keyframe.
+'''
+
+import time
+from collections import OrderedDict
+
+import gi
+gi.require_version('Gst', '1.0')
+gi.require_version('GstVideo', '1.0')
+from gi.repository import Gst, GstVideo
+
+RECOVERY_POLICIES = ("rewind", "skip")
+
+
+class FrameRing:
+    """The last `size` frames pushed to the encoder: frame_id -> index in the frame source.
+
+    Only indices are kept: a resent frame is read again from the (memory-mapped) frame store and
+    re-stamped from the tag cache, which costs the same memcpy as any other frame.
+    """
+
+    def __init__(self, size):
+        self.size = size
+        self.indexes = OrderedDict()    # frame_id -> index in the frame source, oldest first
+
+    def store(self, frame_id, idx):
+        self.indexes[frame_id] = idx
+        self.indexes.move_to_end(frame_id)
+        while len(self.indexes) > self.size:
+            self.indexes.popitem(last=False)
+
+    def __contains__(self, frame_id):
+        return frame_id in self.indexes
+
+    def index(self, frame_id):
+        return self.indexes[frame_id]
+
+
+class NackRecovery:
+    """Turns Nacks into a bounded rewind (or a skip) plus one forced keyframe.
+
+    The Nack itself carries no frame ID (the player could not read it), so the rewind target is
+    the frame after the last acknowledged one, at most rewind_frames behind the current frame and
+    only if it is still in the ring; otherwise the policy degrades to a skip. Nacks arriving less
+    than min_interval seconds after a recovery belong to the same loss and are only counted.
+    on_nack() always returns a valid integer index of the frame source (or None = keep going).
+    """
+
+    def __init__(self, ring, policy="rewind", rewind_frames=15, min_interval=0.5, encoder=None):
+        if policy not in RECOVERY_POLICIES:
+            raise ValueError(f"Unknown recovery policy '{policy}' (expected one of {RECOVERY_POLICIES})")
+        self.ring = ring
+        self.policy = policy
+        self.rewind_frames = rewind_frames
+        self.min_interval = min_interval
+        self.encoder_src = encoder.get_static_pad("src") if encoder is not None else None
+        self.last_acked = 0
+        self.last_recovery = -float("inf")
+        self.nacks = self.ignored = self.rewinds = self.skips = self.keyframes = self.resent = 0
+
+    def on_ack(self, frame_id):
+        if frame_id > self.last_acked:
+            self.last_acked = frame_id
+
+    def force_keyframe(self):
+        """Asks the encoder for an IDR frame (upstream force-key-unit event on its src pad)."""
+        if self.encoder_src is None:
+            return False
+        event = GstVideo.video_event_new_upstream_force_key_unit(Gst.CLOCK_TIME_NONE, True, self.keyframes)
+        if self.encoder_src.send_event(event):
+            self.keyframes += 1
+            return True
+        return False
+
+    def on_nack(self, frame_id):
+        """Nack received while frame_id is being streamed; returns the source index to resend from, or None."""
+        self.nacks += 1
+        now = time.perf_counter()
+        if now - self.last_recovery < self.min_interval:
+            self.ignored += 1
+            return None
+        self.last_recovery = now
+        self.force_keyframe()
+        if self.policy == "rewind":
+            target = max(self.last_acked + 1, frame_id - self.rewind_frames)
+            while target < frame_id and target not in self.ring:
+                target += 1
+            if target < frame_id:
+                self.rewinds += 1
+                self.resent += frame_id - target + 1
+                return self.ring.index(target)
+        self.skips += 1
+        return None
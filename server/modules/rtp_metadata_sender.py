@@ -0,0 +1,61 @@
+'''
+# Date: 2026-10-18
+# Lab: LERIS/UFSCar
+# Project: CGReplay
+# Module: CG Server / RTP Metadata Sender
+# Sends the payloader output itself (appsink -> UDP socket) so that each RTP packet carries the frame
+# metadata in a one-byte header extension (common/rtp_metadata.py).
+'''
+
+import gi
+gi.require_version('Gst', '1.0')
+from gi.repository import Gst
+from collections import OrderedDict, deque
+
+from common.rtp_metadata import add_header_extension, check_ext_id, pack_metadata
+
+
+class RtpMetadataSender:
+    """Tags the RTP packets of each frame with its FrameMetadata and sends them to the player.
+
+    push() queues the metadata of a frame right before the frame is pushed to appsrc; a probe on the
+    appsrc src pad pairs it with the buffer's final PTS (do-timestamp or pacing), and the payloader
+    keeps that PTS on every packet of the frame, so the appsink callback finds the metadata by PTS.
+    The pipeline must end with "<payloader> ! appsink name=<sink_name>" instead of udpsink.
+    """
+
+    def __init__(self, pipeline, appsrc, sock, dest, ext_id=1, sink_name="rtpsink", history=64):
+        self.sock = sock
+        self.dest = dest
+        self.ext_id = check_ext_id(ext_id)
+        self.history = history
+        self.pending = deque()          # metadata of the frames pushed to appsrc, not yet timestamped
+        self.by_pts = OrderedDict()     # PTS -> FrameMetadata
+        self.packets = self.tagged = 0
+
+        appsrc.get_static_pad("src").add_probe(Gst.PadProbeType.BUFFER, self._on_frame)
+        sink = pipeline.get_by_name(sink_name)
+        sink.set_property("emit-signals", True)
+        sink.set_property("sync", False)
+        sink.connect("new-sample", self._on_packet)
+
+    def push(self, metadata):
+        self.pending.append(metadata)
+
+    def _on_frame(self, pad, info):
+        if self.pending:
+            self.by_pts[info.get_buffer().pts] = self.pending.popleft()
+            while len(self.by_pts) > self.history:
+                self.by_pts.popitem(last=False)
+        return Gst.PadProbeReturn.OK
+
+    def _on_packet(self, sink):
+        buffer = sink.emit("pull-sample").get_buffer()
+        packet = buffer.extract_dup(0, buffer.get_size())
+        metadata = self.by_pts.get(buffer.pts)
+        if metadata is not None:
+            packet = add_header_extension(packet, pack_metadata(metadata, self.ext_id))
+            self.tagged += 1
+        self.sock.sendto(packet, self.dest)
+        self.packets += 1
+        return Gst.FlowReturn.OK
@@ -0,0 +1,57 @@
+'''
+# Date: 2026-10-18
+# Lab: LERIS/UFSCar
+# Project: CGReplay
+# Module: CG Server / Replay Sessions
+# One replay session per player: its own pipeline, sync cursor, rate controller, recovery ring and
+# logs, run in its own thread; the frame source, the frame tag cache and the control socket are
+# shared (control messages are demultiplexed by modules/control_plane.SessionRouter).
+'''
+
+import os, threading
+from collections import namedtuple
+
+# session_id: carried by the player's binary control messages (0 = demultiplexed by address only)
+# player_ip / player_port: streaming destination (also the source address of the player's control messages)
+# stream_port: local source port of the stream; name: suffix of the session's logs ("" = single session)
+Session = namedtuple("Session", "session_id player_ip player_port stream_port name")
+
+
+def load_sessions(config):
+    """Sessions of config["sessions"] when enabled, else the single session of the gamer section."""
+    if not config.get("sessions", {}).get("enabled", False):
+        return [Session(0, config["gamer"]["player_IP"], config["gamer"]["player_streaming_port"],
+                        config["server"]["server_port"], "")]
+    sessions = []
+    for player in config["sessions"]["players"]:
+        session_id = player["session_id"]
+        sessions.append(Session(session_id, player["player_IP"], player["player_streaming_port"],
+                                player["stream_port"], f"s{session_id}"))
+    ids = [session.session_id for session in sessions]
+    if len(set(ids)) != len(ids) or 0 in ids:
+        raise ValueError(f"Session IDs must be unique and non-zero: {ids}")
+    ports = [session.stream_port for session in sessions]
+    if len(set(ports)) != len(ports):
+        raise ValueError(f"Each session needs its own stream_port: {ports}")
+    return sessions
+
+
+def session_log_path(path, session):
+    """Log path of a session: logs/srv_frame.csv -> logs/srv_frame_s2.csv (unchanged for a single session)."""
+    if not session.name:
+        return path
+    root, ext = os.path.splitext(path)
+    return f"{root}_{session.name}{ext}"
+
+
+def run_sessions(sessions, target, *args):
+    """Runs target(session, *args) for every session, one thread each, and waits for all of them."""
+    if len(sessions) == 1:
+        target(sessions[0], *args)
+        return
+    threads = [threading.Thread(target=target, args=(session,) + args, name=f"session-{session.name}")
+               for session in sessions]
+    for thread in threads:
+        thread.start()
+    for thread in threads:
+        thread.join()
@@ -0,0 +1,32 @@
+'''
+# Date: 2026-10-18
+# Lab: LERIS/UFSCar
+# Project: CGReplay
+# Offline "prepare" step for the CG Server: decode + resize the game frames once
+# at encoding.resolution so that cg_server1.py only memory-maps them while replaying.
+# Usage (from ./server): python3 prepare_frames.py [Forza Fortnite Kombat]
+'''
+
+import argparse, time, yaml
+
+from modules.frame_store import prepare_frame_store
+
+if __name__ == "__main__":
+    with open("../config/config.yaml", "r") as file:
+        config = yaml.safe_load(file)
+
+    parser = argparse.ArgumentParser(description='Prepare the pre-decoded frame stores of the CG Server')
+    parser.add_argument('games', nargs='*', default=[config["Running"]["game"]],
+                        help='Game sections in config.yaml (default: Running.game)')
+    args = parser.parse_args()
+
+    resolution = (config["encoding"]["resolution"]["width"], config["encoding"]["resolution"]["height"])
+
+    for game in args.games:
+        frame_dir = config[game]["frames"]
+        store_prefix = config[game]["frame_store"]
+        print(f"Preparing {game}: {frame_dir} ==> {store_prefix} at {resolution[0]}x{resolution[1]} ...")
+        start = time.perf_counter()
+        index = prepare_frame_store(frame_dir, store_prefix, resolution)
+        print(f"✅ {len(index['frame_ids'])} frames ({len(index['frame_ids']) * index['frame_size'] / 2**20:.1f} MiB) "
+              f"in {time.perf_counter() - start:.1f} s")
@@ -0,0 +1,93 @@
+'''
+# Date: 2026-10-18
+# Lab: LERIS/UFSCar
+# Project: CGReplay
+# Tests of the buffered CSV logs and of the typed columnar store (common/buffered_log.py, common/metrics_store.py)
+# Usage (from the CGReplay root): python3 -m pytest tests
+'''
+
+import glob, os, sys
+
+import numpy as np
+import pandas as pd
+import pytest
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")) # CGReplay root (common modules)
+from common.buffered_log import BufferedLog
+from common.metrics_store import SCHEMAS, ChunkWriter, load_columns, load_metrics, store_path, to_column
+
+# Sample values per dtype kind: what the endpoints log (text columns also get tuples, e.g. the resolution)
+SAMPLES = {"i": (7, None), "u": (7, None), "f": (1.5, None), "U": ((1200, 720), None)}
+
+
+def chunks(path):
+    return sorted(glob.glob(os.path.join(store_path(path), "chunk_*.npz")))
+
+
+@pytest.mark.parametrize("name", sorted(SCHEMAS))
+def test_schema_round_trip(tmp_path, name):
+    """Two rows per schema through BufferedLog, loaded back from the store and from the CSV."""
+    schema = SCHEMAS[name]
+    path = str(tmp_path / f"{name}.csv")
+    log = BufferedLog(path, schema, 1, 1.0, ("csv", "npz"))   # one row per batch: no None to hide a bad shape
+    for row in range(2):
+        log.log(*(SAMPLES[np.dtype(dtype).kind][row] for _, dtype in schema))
+    log.close()
+
+    columns = load_columns(path)
+    assert list(columns) == [column for column, _ in schema]
+    for column, dtype in schema:
+        assert columns[column].shape == (2,), column
+        assert columns[column].dtype == np.dtype(dtype), column
+        if np.dtype(dtype).kind == "U":
+            assert columns[column][0] == str(SAMPLES["U"][0])[:np.dtype(dtype).itemsize // 4], column
+    assert len(load_metrics(path)) == 2
+    assert len(pd.read_csv(path)) == 2
+
+
+def test_chunks_written_at_chunk_rows_and_close(tmp_path):
+    """Flushes only append to the CSV: a chunk is written once chunk_rows rows are buffered, the rest by close()."""
+    path = str(tmp_path / "rate.csv")
+    log = BufferedLog(path, SCHEMAS["player_rate"], 4, 1.0, ("csv", "npz"), chunk_rows=8)
+    for frame_id in range(6):
+        log.log(frame_id, 30.0, 10.0)
+    log.flush()
+    assert chunks(path) == []
+    assert len(pd.read_csv(path)) == 6
+
+    for frame_id in range(6, 10):
+        log.log(frame_id, 30.0, 10.0)
+    log.flush()
+    assert len(chunks(path)) == 1
+
+    log.log(10, 30.0, 10.0)
+    log.close()
+    assert len(chunks(path)) == 2
+    assert load_columns(path)["frame_id"].tolist() == list(range(11))
+
+
+def test_chunk_writer_replaces_previous_run(tmp_path):
+    path = str(tmp_path / "rate.csv")
+    writer = ChunkWriter(path, SCHEMAS["player_rate"])
+    writer.append([[1], [30.0], [10.0]], 1)
+    writer.close()
+    writer = ChunkWriter(path, SCHEMAS["player_rate"])
+    writer.close()
+    assert chunks(path) == []
+
+
+def test_to_column_missing_and_text_values():
+    assert to_column([1, None], "i8").tolist() == [1, -1]
+    assert np.isnan(to_column([None], "f8")[0])
+    assert to_column(["1.25", "n/a"], "f8")[0] == 1.25      # numeric text parsed, the rest is missing
+    assert np.isnan(to_column(["1.25", "n/a"], "f8")[1])
+    assert to_column([(1200, 720), None], "U16").tolist() == ["(1200, 720)", ""]
+
+
+def test_load_metrics_falls_back_to_csv(tmp_path):
+    path = str(tmp_path / "rate.csv")
+    log = BufferedLog(path, SCHEMAS["player_rate"], 4, 1.0, ("csv",))
+    log.log(1, 30.0, 10.0)
+    log.close()
+    assert not os.path.exists(store_path(path))
+    assert load_metrics(path)["frame_id"].tolist() == [1]
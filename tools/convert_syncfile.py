@@ -0,0 +1,39 @@
+'''
+# Date: 2026-10-18
+# Lab: LERIS/UFSCar
+# Project: CGReplay
+# Converts text sync files (ID,command,encrypted_cmd) into the compact binary sync format
+# read (memory-mapped) by both the CG Server and the player (see common/sync_table.py).
+# Usage (from ./tools): python3 convert_syncfile.py ../server/syncs/sync_kombat.txt [-o out.bin] [--no-payload]
+'''
+
+import argparse, os, sys, time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")) # CGReplay root (common modules)
+from common.sync_table import load_syncfile, write_binary_syncfile, SyncTable
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Convert text sync files into the binary sync format')
+    parser.add_argument('sync_files', nargs='+', help='Text sync files (syncs/*.txt)')
+    parser.add_argument('--output', '-o', type=str, help='Output file (single input only; default: <input>.bin)')
+    parser.add_argument('--no-payload', action='store_true', help='Do not pack the axes/buttons of each command')
+    args = parser.parse_args()
+
+    if args.output and len(args.sync_files) > 1:
+        parser.error("--output can only be used with a single sync file")
+
+    for sync_file in args.sync_files:
+        output = args.output or os.path.splitext(sync_file)[0] + ".bin"
+        ids, commands, encrypted_cmds = load_syncfile(sync_file)
+        rows = write_binary_syncfile(output, ids, encrypted_cmds, None if args.no_payload else commands)
+
+        # Check the round trip through the memory-mapped reader
+        start = time.perf_counter()
+        table = SyncTable.load(output)
+        load_time = time.perf_counter() - start
+        if list(table.encrypted) != encrypted_cmds or table.ids.tolist() != ids:
+            print(f"❌ {output}: round trip mismatch")
+            sys.exit(1)
+
+        print(f"✅ {sync_file} ==> {output}: {rows} commands, {os.path.getsize(sync_file)} ==> "
+              f"{os.path.getsize(output)} bytes, loaded in {load_time * 1000:.1f} ms")
@@ -0,0 +1,35 @@
+'''
+# Date: 2026-10-18
+# Lab: LERIS/UFSCar
+# Project: CGReplay
+# Summarizes or exports the typed columnar logs (<log>.cols, see common/metrics_store.py) written next
+# to the CSV logs of the CG Server and player, e.g. to feed CSV-only tools with a log whose CSV was disabled.
+# Usage (from ./tools): python3 export_metrics.py ../server/logs/srv_frame.cols [--csv out.csv]
+'''
+
+import argparse, os, sys, time
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")) # CGReplay root (common modules)
+from common.metrics_store import has_store, load_metrics
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Summarize or export the columnar metrics logs')
+    parser.add_argument('logs', nargs='+', help='Columnar logs (<log>.cols) or their CSV log paths')
+    parser.add_argument('--csv', '-c', type=str, help='Export to this CSV file (single input only)')
+    args = parser.parse_args()
+
+    if args.csv and len(args.logs) > 1:
+        parser.error("--csv can only be used with a single log")
+
+    for log in args.logs:
+        if not has_store(log):
+            print(f"❌ {log}: no columnar store")
+            continue
+        start = time.perf_counter()
+        df = load_metrics(log)
+        load_time = time.perf_counter() - start
+        print(f"✅ {log}: {len(df)} rows x {len(df.columns)} columns, loaded in {load_time * 1000:.1f} ms")
+        print(df.describe().transpose().to_string())
+        if args.csv:
+            df.to_csv(args.csv, index=False)
+            print(f"Exported to {args.csv}")
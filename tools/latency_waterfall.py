@@ -0,0 +1,107 @@
+'''
+# Date: 2026-10-18
+# Lab: LERIS/UFSCar
+# Project: CGReplay
+# Per-frame end-to-end latency waterfall: joins the stage timestamps of the CG Server (srv_stages) and
+# of the player (ply_stages) by frame ID, moves the player's onto the server clock with the clock sync
+# offset logged next to them (common/clock_sync.py) and splits each frame's latency into stages:
+#   prepare (load, overlay, pacing) | convert | encode | packetize | network (+ depayload) | decode | detect | respond
+# The network stage carries the clock sync error (up to RTT/2, column sync_error_ms).
+# Usage (from ./tools): python3 latency_waterfall.py ../server/logs/srv_stages.csv ../player/logs/ply_stages.csv [--csv out.csv] [--plot out.png]
+'''
+
+import argparse, os, sys
+
+import numpy as np
+
+sys.path.append(os.path.join(os.path.dirname(os.path.abspath(__file__)), "..")) # CGReplay root (common modules)
+from common.metrics_store import load_metrics
+
+# (stage, start column, end column): server columns are in the server clock, player columns once shifted
+STAGES = [
+    ("prepare", "captured", "pushed"),
+    ("convert", "pushed", "encode_start"),
+    ("encode", "encode_start", "encode_end"),
+    ("packetize", "encode_end", "sent"),
+    ("network", "sent", "depayloaded"),
+    ("decode", "depayloaded", "decoded"),
+    ("detect", "decoded", "detected"),
+    ("respond", "detected", "responded"),
+]
+PLAYER_TIMES = ("depayloaded", "decoded", "detected", "responded")
+
+
+def waterfall(server, player):
+    """DataFrame with one row per frame seen by both ends: the stage durations and the total in ms."""
+    # A frame resent after a Nack is logged again: its first transmission is the one measured
+    server = server[server["frame_id"] >= 0].drop_duplicates("frame_id", keep="first")
+    player = player[player["frame_id"] >= 0].drop_duplicates("frame_id", keep="first")
+    player = player[player["clock_offset"].notna()].copy()
+    for column in PLAYER_TIMES:
+        player[column] = player[column] + player["clock_offset"]
+    frames = server.merge(player, on="frame_id")
+
+    result = frames[["frame_id"]].copy()
+    for stage, start, end in STAGES:
+        result[f"{stage}_ms"] = (frames[end] - frames[start]) * 1000
+    # No depayloader timestamp (SCReAM pipelines): network and decode are measured together
+    no_depay = frames["depayloaded"].isna()
+    result.loc[no_depay, "network_ms"] = (frames["decoded"] - frames["sent"])[no_depay] * 1000
+    result["total_ms"] = (frames["responded"].fillna(frames["detected"]) - frames["captured"]) * 1000
+    result["sync_error_ms"] = frames["clock_rtt"] / 2 * 1000
+    return result
+
+
+def summary(result):
+    """Mean / p50 / p95 / max of each stage and its share of the mean total."""
+    total = np.nanmean(result["total_ms"])
+    lines = [f"{'stage':<10} {'mean':>9} {'p50':>9} {'p95':>9} {'max':>9} {'share':>7}"]
+    stages = [stage for stage, _, _ in STAGES]
+    for name in stages + ["total", "sync_error"]:
+        values = result[f"{name}_ms"].dropna().to_numpy()
+        if not len(values):
+            continue
+        mean = values.mean()
+        share = f"{mean / total:.1%}" if name in stages else ""
+        lines.append(f"{name:<10} {mean:>9.3f} {np.percentile(values, 50):>9.3f}"
+                     f" {np.percentile(values, 95):>9.3f} {values.max():>9.3f} {share:>7}")
+    return "\n".join(lines)
+
+
+def plot(result, path):
+    """Stacked bars of the stage durations per frame."""
+    import matplotlib.pyplot as plt
+
+    fig, ax = plt.subplots(figsize=(12, 5))
+    bottom = np.zeros(len(result))
+    for stage, _, _ in STAGES:
+        values = result[f"{stage}_ms"].fillna(0).clip(lower=0).to_numpy()
+        ax.bar(result["frame_id"], values, bottom=bottom, width=1.0, label=stage)
+        bottom += values
+    ax.set_xlabel("Frame ID")
+    ax.set_ylabel("Latency (ms)")
+    ax.set_title("Per-frame latency waterfall (server clock)")
+    ax.legend(ncol=4, fontsize="small")
+    fig.tight_layout()
+    fig.savefig(path, dpi=150)
+
+
+if __name__ == "__main__":
+    parser = argparse.ArgumentParser(description='Per-frame latency waterfall from the server and player stage logs')
+    parser.add_argument('server_stages', help='Server stage log (srv_stages.csv or its .cols store)')
+    parser.add_argument('player_stages', help='Player stage log (ply_stages.csv or its .cols store)')
+    parser.add_argument('--csv', '-c', type=str, help='Write the per-frame waterfall to this CSV file')
+    parser.add_argument('--plot', '-p', type=str, help='Save the per-frame stacked bar chart to this image')
+    args = parser.parse_args()
+
+    result = waterfall(load_metrics(args.server_stages), load_metrics(args.player_stages))
+    if result.empty:
+        sys.exit("❌ No frame in common (or no clock sync offset in the player log)")
+    print(f"✅ {len(result)} frames (latency in ms, server clock)")
+    print(summary(result))
+    if args.csv:
+        result.to_csv(args.csv, index=False)
+        print(f"Per-frame waterfall written to {args.csv}")
+    if args.plot:
+        plot(result, args.plot)
+        print(f"Waterfall chart saved to {args.plot}")